@@ -0,0 +1,30 @@
+"""add alerts feed index
+
+Revision ID: a7b8c9d0e1f2
+Revises: f4a5b6c7d8e9
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a7b8c9d0e1f2"
+down_revision = "f4a5b6c7d8e9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_alerts_feed",
+        "alerts",
+        ["is_dismissed", "is_read", "type", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_alerts_feed", table_name="alerts")
@@ -0,0 +1,30 @@
+"""add transaction dedup prefilter index
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b8c9d0e1f2a3"
+down_revision = "a7b8c9d0e1f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_tx_acct_date_amt",
+        "transactions",
+        ["account_id", "date", "amount"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tx_acct_date_amt", table_name="transactions")
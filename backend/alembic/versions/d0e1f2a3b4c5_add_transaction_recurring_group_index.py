@@ -0,0 +1,31 @@
+"""add transaction recurring_group_id, date index
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d0e1f2a3b4c5"
+down_revision = "c9d0e1f2a3b4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Also serves recurring_group_id-only lookups and counts
+    op.create_index(
+        "ix_txn_group_date",
+        "transactions",
+        ["recurring_group_id", "date"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_txn_group_date", table_name="transactions")
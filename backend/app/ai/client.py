@@ -1,8 +1,9 @@
 import logging
 import litellm
 import uuid
-from typing import Optional, Dict, Any, Literal, AsyncIterator
+from typing import Optional, Dict, Any, Literal, AsyncIterator, Type, Union
 import json
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.orm import Session
 
 from app.config import settings
@@ -224,7 +225,13 @@ class AIClient:
         user_prompt: str,
         temperature: float = 0.1,
         max_tokens: int = 1000,
-    ) -> Dict[str, Any]:
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> Union[Dict[str, Any], BaseModel]:
+        """
+        Complete and parse a JSON response.
+        When a schema is given, the reply is validated straight from the raw
+        string into that model instead of json.loads + dict walking.
+        """
         response = await self.complete(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
@@ -242,8 +249,10 @@ class AIClient:
             cleaned = cleaned[:-3]
 
         try:
+            if schema is not None:
+                return schema.model_validate_json(cleaned.strip())
             return json.loads(cleaned.strip())
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValidationError) as e:
             logger.error(f"Failed to parse AI JSON response: {e}")
             logger.debug(f"Raw response was: {cleaned[:500]}")
             raise ValueError("AI returned an invalid response format")
@@ -252,25 +261,14 @@ class AIClient:
         if self._db is None:
             return False
 
-        from app.models.privacy_settings import get_or_create_privacy_settings
+        from app.models.privacy_settings import get_obfuscation_flags
 
-        privacy_settings = get_or_create_privacy_settings(self._db)
+        enabled, providers = get_obfuscation_flags(self._db)
 
-        if not privacy_settings.obfuscation_enabled:
+        if not enabled:
             return False
 
-        provider = provider or self.provider
-
-        if provider == "ollama":
-            return privacy_settings.ollama_obfuscation
-        elif provider == "openrouter":
-            return privacy_settings.openrouter_obfuscation
-        elif provider == "anthropic":
-            return privacy_settings.anthropic_obfuscation
-        elif provider == "openai":
-            return privacy_settings.openai_obfuscation
-
-        return True
+        return providers.get(provider or self.provider, True)
 
 
 _ai_client: Optional[AIClient] = None
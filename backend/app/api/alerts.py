@@ -134,8 +134,8 @@ def update_alert(alert_id: str, update: AlertUpdate, db: Session = Depends(get_d
 @router.post("/mark-all-read")
 def mark_all_read(db: Session = Depends(get_db)):
     """Mark all alerts as read."""
-    count = alerts_service.mark_all_read(db)
-    return {"marked_read": count}
+    alert_ids = alerts_service.mark_all_read(db)
+    return {"marked_read": len(alert_ids), "alert_ids": alert_ids}
 
 
 @router.delete("/{alert_id}")
@@ -4,8 +4,18 @@ Import API endpoints.
 
 import hashlib
 import logging
+import os
 from typing import Optional
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    UploadFile,
+    File,
+    HTTPException,
+    Query,
+    Request,
+)
 from sqlalchemy.orm import Session
 
 from app.dependencies import get_db
@@ -49,19 +59,17 @@ async def upload_file(
         )
 
     try:
-        chunks = []
-        total_size = 0
-        while chunk := await file.read(8192):
-            total_size += len(chunk)
-            if total_size > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"File exceeds {MAX_FILE_SIZE // (1024 * 1024)}MB limit",
-                )
-            chunks.append(chunk)
-        content = b"".join(chunks)
-
-        file_path, import_id = import_service.save_upload(content, file.filename)
+        # Size the spooled upload without reading it into memory
+        file.file.seek(0, os.SEEK_END)
+        total_size = file.file.tell()
+        file.file.seek(0)
+        if total_size > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File exceeds {MAX_FILE_SIZE // (1024 * 1024)}MB limit",
+            )
+
+        file_path, import_id = import_service.save_upload(file.file, file.filename)
         return await import_service.get_preview_with_ai(
             db, file_path, import_id, file.filename
         )
@@ -74,27 +82,33 @@ async def upload_file(
         raise HTTPException(status_code=500, detail="Failed to process upload")
 
 
-@router.post("/{import_id}/confirm", response_model=ImportStatusResponse)
+@router.post(
+    "/{import_id}/confirm", response_model=ImportStatusResponse, status_code=202
+)
 @limiter.limit("5/minute")
 async def confirm_import(
     request: Request,
     import_id: str,
     confirm_request: ImportConfirmRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
-    """Confirm and process import with AI categorization"""
+    """Queue an import for AI processing; poll /status for the result"""
     try:
-        return await import_service.process_import_with_ai(
-            db, import_id, confirm_request
-        )
+        status = import_service.start_import(db, import_id, confirm_request)
+    except import_service.ImportConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        import logging
-
-        logging.getLogger(__name__).error(f"Import confirm error: {e}", exc_info=True)
+        logger.error(f"Import confirm error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process import")
 
+    background_tasks.add_task(
+        import_service.run_import_job, import_id, confirm_request
+    )
+    return status
+
 
 @router.get("/{import_id}/status", response_model=ImportStatusResponse)
 def get_import_status(import_id: str, db: Session = Depends(get_db)):
@@ -16,7 +16,7 @@ from app.schemas.privacy import (
 )
 from app.services.tokenization_service import TokenizationService
 from app.models.token_map import TokenMap, TokenType
-from app.models.privacy_settings import get_or_create_privacy_settings
+from app.models.privacy_settings import get_or_create_privacy_settings, invalidate_cache
 
 router = APIRouter(prefix="/privacy", tags=["privacy"])
 
@@ -70,6 +70,7 @@ def update_privacy_settings(
                 settings.openai_obfuscation = ps.obfuscation_enabled
 
     db.commit()
+    invalidate_cache(db)
     db.refresh(settings)
 
     return get_privacy_settings(db)
@@ -81,10 +82,9 @@ def preview_tokenization(
     db: Session = Depends(get_db)
 ) -> PrivacyPreview:
     """Preview how text would be tokenized."""
-    token_service = TokenizationService(db)
-
-    # Try tokenizing as merchant
-    tokenized = token_service.tokenize_merchant(text)
+    with TokenizationService(db) as token_service:
+        # Try tokenizing as merchant
+        tokenized = token_service.tokenize_merchant(text)
 
     return PrivacyPreview(
         original=text,
@@ -126,12 +126,12 @@ def tokenize_merchants(
 ):
     """Tokenize a list of merchant names."""
     merchants = request.get("merchants", [])
-    token_service = TokenizationService(db)
-
-    tokenized = []
-    for merchant in merchants:
-        token = token_service.tokenize_merchant(merchant)
-        tokenized.append({"original": merchant, "token": token})
+    with TokenizationService(db) as token_service:
+        tokens = token_service.tokenize_many(merchants, TokenType.merchant)
+    tokenized = [
+        {"original": merchant, "token": token}
+        for merchant, token in zip(merchants, tokens)
+    ]
 
     return {"tokenized": tokenized}
 
@@ -143,12 +143,11 @@ def detokenize_tokens(
 ):
     """Detokenize tokens back to original values."""
     tokens = request.get("tokens", [])
-    token_service = TokenizationService(db)
+    originals = TokenizationService(db).get_originals(tokens)
 
-    detokenized = []
-    for token in tokens:
-        original = token_service._reverse_cache.get(token)
-        detokenized.append({"token": token, "original": original})
+    detokenized = [
+        {"token": token, "original": originals.get(token)} for token in tokens
+    ]
 
     return {"detokenized": detokenized}
 
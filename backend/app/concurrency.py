@@ -0,0 +1,23 @@
+"""
+Bounded fan-out for concurrent AI calls.
+
+Services that send many independent prompts share one helper so every
+caller respects settings.ai_max_concurrency the same way.
+"""
+
+import asyncio
+from typing import Any, List
+
+
+async def gather_bounded(coros: List[Any], limit: int) -> List[Any]:
+    """
+    asyncio.gather with at most `limit` coroutines in flight.
+    Exceptions are returned in place of results, as with return_exceptions=True.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
@@ -17,6 +17,7 @@ class Settings(BaseSettings):
     database_url: str = "sqlite:///./data/db.sqlite"
 
     # Import paths
+    # Keep these on one filesystem so finished uploads move by rename, not copy
     import_inbox_path: str = "./data/imports/inbox"
     import_processed_path: str = "./data/imports/processed"
     import_failed_path: str = "./data/imports/failed"
@@ -36,6 +37,15 @@ class Settings(BaseSettings):
     ai_clean_merchants: bool = True
     ai_detect_format: bool = True
 
+    # Max in-flight AI requests per import (keeps bulk imports under provider rate limits)
+    ai_max_concurrency: int = 16
+
+    # Uploads not confirmed within this window are treated as expired
+    pending_import_ttl_hours: int = 24
+
+    # Cached AI responses older than this are ignored and pruned
+    llm_cache_ttl_hours: int = 24
+
     # Server
     api_host: str = "0.0.0.0"
     api_port: int = 8000
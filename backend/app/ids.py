@@ -0,0 +1,29 @@
+"""
+Time-ordered UUID generation.
+
+UUIDv7 (RFC 9562) leads with a millisecond timestamp, so new primary keys
+sort after existing ones and inserts append to the end of the id index
+instead of landing on random B-tree pages.
+"""
+
+import os
+import time
+from typing import List
+
+
+def uuid7_strings(count: int) -> List[str]:
+    """Generate `count` UUIDv7 strings sharing one timestamp and one urandom draw."""
+    ts = f"{time.time_ns() // 1_000_000:012x}"
+    prefix = f"{ts[:8]}-{ts[8:]}-7"
+    raw = os.urandom(10 * count).hex()  # 12 bits rand_a + 62 bits rand_b per id
+    variants = "89ab" * 4  # RFC variant bits on the 17th hex digit
+    ids = []
+    for start in range(0, 20 * count, 20):
+        r = raw[start:start + 20]
+        ids.append(f"{prefix}{r[:3]}-{variants[int(r[3], 16)]}{r[4:7]}-{r[7:19]}")
+    return ids
+
+
+def new_id() -> str:
+    """Generate a single UUIDv7 string."""
+    return uuid7_strings(1)[0]
@@ -18,6 +18,7 @@ from app.models.conversation import Conversation, Message, MessageRole
 from app.models.rule import CategorizationRule, MatchField, MatchType
 from app.models.ai_token_usage import AITokenUsage
 from app.models.pending_import import PendingImport
+from app.models.llm_response_cache import LLMResponseCache
 
 __all__ = [
     "Account",
@@ -52,4 +53,5 @@ __all__ = [
     "MatchType",
     "AITokenUsage",
     "PendingImport",
+    "LLMResponseCache",
 ]
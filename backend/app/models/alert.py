@@ -4,7 +4,7 @@ Alert database models.
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Enum, Text, JSON, ForeignKey, Integer, Numeric
+from sqlalchemy import Column, String, Boolean, DateTime, Enum, Text, JSON, ForeignKey, Integer, Numeric, Index
 from sqlalchemy.orm import relationship
 import enum
 from app.database import Base
@@ -48,6 +48,11 @@ class Alert(Base):
     action_taken = Column(String(100), nullable=True)  # "kept", "cancelled", "reviewed", etc.
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
+    # Covers the alert feed: filter on dismissed/read/type, newest first
+    __table_args__ = (
+        Index("ix_alerts_feed", "is_dismissed", "is_read", "type", "created_at"),
+    )
+
     # Relationships
     transaction = relationship("Transaction", back_populates="alerts")
     recurring_group = relationship("RecurringGroup", back_populates="alerts")
@@ -0,0 +1,20 @@
+"""
+LLM response cache model.
+
+Stores parsed JSON responses keyed by a digest of the model and prompts,
+so re-running an AI pass over unchanged data skips the provider call.
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Text
+from app.database import Base
+
+
+class LLMResponseCache(Base):
+    """Cached AI responses, expired by created_at."""
+
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(32), primary_key=True)
+    response_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,11 +1,17 @@
 """Privacy settings model - persisted in database like alert_settings."""
 
+from typing import Dict, Tuple
+
 from sqlalchemy import Column, Integer, Boolean, DateTime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.sql import func
 import uuid
 
 from app.database import Base
 
+# Session.info key for the flags snapshot; each session reads its own
+_FLAGS_KEY = "privacy_obfuscation_flags"
+
 
 class PrivacySettings(Base):
     """
@@ -35,10 +41,41 @@ class PrivacySettings(Base):
 
 def get_or_create_privacy_settings(db) -> PrivacySettings:
     """Get the singleton privacy settings, creating with defaults if needed."""
-    settings = db.query(PrivacySettings).filter(PrivacySettings.id == 1).first()
-    if not settings:
-        settings = PrivacySettings(id=1)
-        db.add(settings)
+    # Served from the session's identity map after the first call
+    settings = db.get(PrivacySettings, 1)
+    if settings is None:
+        # A concurrent first request may have created the row; keep theirs
+        db.execute(
+            sqlite_insert(PrivacySettings)
+            .values(id=1)
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
         db.commit()
-        db.refresh(settings)
+        settings = db.get(PrivacySettings, 1)
     return settings
+
+
+def invalidate_cache(db):
+    """Drop this session's cached obfuscation flags; call after writing privacy settings."""
+    db.info.pop(_FLAGS_KEY, None)
+
+
+def get_obfuscation_flags(db) -> Tuple[bool, Dict[str, bool]]:
+    """
+    Master toggle and per-provider obfuscation flags.
+    Cached on the session as plain values, so they survive commits that
+    expire the ORM row without another SQL read.
+    """
+    flags = db.info.get(_FLAGS_KEY)
+    if flags is None:
+        settings = get_or_create_privacy_settings(db)
+        flags = db.info[_FLAGS_KEY] = (
+            settings.obfuscation_enabled,
+            {
+                "ollama": settings.ollama_obfuscation,
+                "openrouter": settings.openrouter_obfuscation,
+                "anthropic": settings.anthropic_obfuscation,
+                "openai": settings.openai_obfuscation,
+            },
+        )
+    return flags
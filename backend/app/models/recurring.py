@@ -2,7 +2,6 @@
 Recurring group database model.
 """
 
-import uuid
 from datetime import datetime, date
 from decimal import Decimal
 from sqlalchemy import (
@@ -19,6 +18,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 import enum
 from app.database import Base
+from app.ids import new_id
 
 
 class Frequency(str, enum.Enum):
@@ -36,7 +36,7 @@ class RecurringGroup(Base):
 
     __tablename__ = "recurring_groups"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String(36), primary_key=True, default=new_id)
     name = Column(String(100), nullable=False)
     merchant_pattern = Column(String(255), nullable=False, index=True)
     expected_amount = Column(Numeric(12, 2), nullable=True)
@@ -2,7 +2,6 @@
 Transaction database model.
 """
 
-import uuid
 from datetime import datetime, date
 from decimal import Decimal
 from sqlalchemy import (
@@ -18,6 +17,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.ids import new_id
 
 
 class Transaction(Base):
@@ -25,7 +25,7 @@ class Transaction(Base):
 
     __tablename__ = "transactions"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String(36), primary_key=True, default=new_id)
     hash = Column(String(64), unique=True, nullable=False, index=True)
     date = Column(Date, nullable=False, index=True)
     amount = Column(Numeric(12, 2), nullable=False)
@@ -64,4 +64,6 @@ class Transaction(Base):
     __table_args__ = (
         Index("idx_transaction_date_account", "date", "account_id"),
         Index("idx_transaction_category_date", "category_id", "date"),
+        Index("ix_tx_acct_date_amt", "account_id", "date", "amount"),
+        Index("ix_txn_group_date", "recurring_group_id", "date"),
     )
@@ -36,3 +36,8 @@ class BaseParser(ABC):
     ) -> Tuple[List[str], List[List[str]]]:
         """Return (headers, preview_rows) for format confirmation"""
         pass
+
+    @abstractmethod
+    def count_rows(self, file_path: Path) -> int:
+        """Return the number of transaction rows in the file"""
+        pass
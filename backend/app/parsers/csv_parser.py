@@ -43,6 +43,25 @@ class CSVParser(BaseParser):
                     break
             return headers, preview_rows
 
+    def count_rows(self, file_path: Path) -> int:
+        """
+        Count data rows (excluding the header) by scanning raw bytes for
+        line breaks in 1MB chunks, rather than decoding and iterating every line.
+        Matches universal newlines: \n, \r\n and a bare \r each end a line.
+        """
+        breaks = 0
+        last_byte = b"\n"
+        with open(file_path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                breaks += chunk.count(b"\n") + chunk.count(b"\r") - chunk.count(b"\r\n")
+                # A \r\n split across chunks was counted once per side
+                if last_byte == b"\r" and chunk[:1] == b"\n":
+                    breaks -= 1
+                last_byte = chunk[-1:]
+        # A final line without a trailing line break still counts
+        lines = breaks + (last_byte not in (b"\n", b"\r"))
+        return max(lines - 1, 0)
+
     def parse(
         self,
         file_path: Path,
@@ -15,9 +15,29 @@ from app.parsers.base import BaseParser
 class OFXParser(BaseParser):
     """Parser for OFX/QFX bank exports"""
 
+    def __init__(self):
+        # Last parsed document, so preview/count/balance on one upload
+        # share a single parse
+        self._parsed: Optional[Tuple[Path, Any]] = None
+
     def can_parse(self, file_path: Path) -> bool:
         return file_path.suffix.lower() in ['.ofx', '.qfx']
 
+    def _load(self, file_path: Path):
+        """Parse the OFX file, reusing the previous result for the same path"""
+        if self._parsed is not None and self._parsed[0] == file_path:
+            return self._parsed[1]
+
+        with open(file_path, 'rb') as f:
+            ofx = OFXParseLib.parse(f)
+
+        self._parsed = (file_path, ofx)
+        return ofx
+
+    def count_rows(self, file_path: Path) -> int:
+        ofx = self._load(file_path)
+        return sum(len(acc.statement.transactions) for acc in ofx.accounts)
+
     def get_preview(
         self,
         file_path: Path,
@@ -26,8 +46,7 @@ class OFXParser(BaseParser):
         """Return headers and preview rows for OFX"""
         headers = ['Date', 'Amount', 'Description', 'Type', 'ID']
 
-        with open(file_path, 'rb') as f:
-            ofx = OFXParseLib.parse(f)
+        ofx = self._load(file_path)
 
         preview_rows = []
         for account in ofx.accounts:
@@ -55,8 +74,7 @@ class OFXParser(BaseParser):
         """Parse OFX and return transaction dicts"""
         transactions = []
 
-        with open(file_path, 'rb') as f:
-            ofx = OFXParseLib.parse(f)
+        ofx = self._load(file_path)
 
         for account in ofx.accounts:
             for txn in account.statement.transactions:
@@ -82,8 +100,7 @@ class OFXParser(BaseParser):
             Balance as Decimal, or None if no balance information found
         """
         try:
-            with open(file_path, 'rb') as f:
-                ofx = OFXParseLib.parse(f)
+            ofx = self._load(file_path)
 
             # OFX files can have multiple accounts
             # We'll return the first account's ledger balance
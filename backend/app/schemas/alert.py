@@ -87,6 +87,12 @@ class SubscriptionInsight(BaseModel):
     recommendation: str
 
 
+class SubscriptionReviewResult(BaseModel):
+    """Shape of the AI subscription review reply."""
+    insights: List[SubscriptionInsight] = []
+    summary: str = "Review complete."
+
+
 class SubscriptionReviewResponse(BaseModel):
     total_monthly_cost: float
     total_yearly_cost: float
@@ -110,6 +116,20 @@ class UpcomingRenewalsResponse(BaseModel):
     total_upcoming_30_days: float
 
 
+class AnnualSubscriptionCandidate(BaseModel):
+    merchant: str
+    amount: float
+    transaction_ids: List[str] = []
+    last_charge_date: Optional[str] = None
+    predicted_next_date: Optional[str] = None
+    confidence: float = 0.0
+
+
+class AnnualChargeDetectionResult(BaseModel):
+    """Shape of the AI annual charge detection reply."""
+    annual_subscriptions: List[AnnualSubscriptionCandidate] = []
+
+
 class AlertSettingsResponse(AlertSettingsBase):
     id: str
     created_at: datetime
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 import json
 import logging
 
-from app.ai.client import get_ai_client_with_db
+from app.ai.client import AIClient, get_ai_client_with_db
 from app.ai.prompts import (
     FORMAT_DETECTION_SYSTEM,
     FORMAT_DETECTION_USER,
@@ -75,28 +75,10 @@ async def clean_merchant_name(db: Session, raw_description: str) -> Optional[str
         return None
 
 
-async def categorize_transaction_with_context(
-    db: Session,
-    clean_merchant: Optional[str],
-    raw_description: str,
-    amount: float,
-    date: str,
-    account_type: str = "bank",
-    categories: Optional[List[Category]] = None,
-    corrections: Optional[List[UserCorrection]] = None,
-) -> Optional[Dict[str, Any]]:
-    """
-    Categorize a transaction using pre-fetched categories and corrections.
-    This avoids N queries per transaction during bulk import.
-    """
-    if not settings.ai_auto_categorize:
-        return None
-
-    client = get_ai_client_with_db(db, task="categorize")
-
-    if categories is None:
-        categories = db.query(Category).all()
-
+def build_categorization_system_prompt(
+    categories: List[Category], corrections: List[UserCorrection]
+) -> str:
+    """Render the categorization system prompt for a fixed category list."""
     categories_json = json.dumps(
         [
             {
@@ -106,18 +88,9 @@ async def categorize_transaction_with_context(
                 "hint": c.llm_prompt,
             }
             for c in categories
-        ],
-        indent=2,
+        ]
     )
 
-    if corrections is None:
-        corrections = (
-            db.query(UserCorrection)
-            .order_by(UserCorrection.created_at.desc())
-            .limit(20)
-            .all()
-        )
-
     if corrections:
         corrections_text = "\n".join(
             [
@@ -128,10 +101,50 @@ async def categorize_transaction_with_context(
     else:
         corrections_text = "No previous corrections yet."
 
-    system_prompt = CATEGORIZATION_SYSTEM.format(
+    return CATEGORIZATION_SYSTEM.format(
         categories_json=categories_json, user_corrections=corrections_text
     )
 
+
+async def categorize_transaction_with_context(
+    db: Session,
+    clean_merchant: Optional[str],
+    raw_description: str,
+    amount: float,
+    date: str,
+    account_type: str = "bank",
+    categories: Optional[List[Category]] = None,
+    corrections: Optional[List[UserCorrection]] = None,
+    client: Optional[AIClient] = None,
+    system_prompt: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Categorize a transaction using pre-fetched categories and corrections.
+    This avoids N queries per transaction during bulk import.
+
+    Bulk callers can also pass a shared client and a prebuilt system prompt
+    so neither is rebuilt for every transaction.
+    """
+    if not settings.ai_auto_categorize:
+        return None
+
+    if client is None:
+        client = get_ai_client_with_db(db, task="categorize")
+
+    if system_prompt is None:
+        if categories is None:
+            categories = db.query(Category).all()
+
+        if corrections is None:
+            corrections = (
+                db.query(UserCorrection)
+                .order_by(UserCorrection.created_at.desc())
+                .limit(20)
+                .all()
+            )
+
+        system_prompt = build_categorization_system_prompt(categories, corrections)
+
     safe_merchant = sanitize_merchant_name(clean_merchant or raw_description)
     safe_description = sanitize_description(raw_description)
 
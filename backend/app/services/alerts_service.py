@@ -5,7 +5,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta, date
 from decimal import Decimal
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, update
 import uuid
 import json
 
@@ -13,6 +13,7 @@ from app.models.alert import Alert, AlertType, Severity, AlertSettings
 from app.models.transaction import Transaction
 from app.models.recurring import RecurringGroup, Frequency
 from app.models.category import Category
+from app.schemas.alert import AnnualChargeDetectionResult, SubscriptionReviewResult
 from app.ai.client import get_ai_client
 from app.ai.prompts import (
     ANOMALY_DETECTION_SYSTEM,
@@ -23,6 +24,7 @@ from app.ai.prompts import (
     ANNUAL_CHARGE_DETECTION_USER,
 )
 from app.services.tokenization_service import TokenizationService
+from app.models.token_map import TokenType
 
 logger = logging.getLogger(__name__)
 
@@ -127,11 +129,11 @@ def is_first_time_merchant(
     db: Session, merchant: str, exclude_txn_id: str = None
 ) -> bool:
     """Check if this is the first transaction from this merchant."""
-    query = db.query(Transaction).filter(Transaction.clean_merchant == merchant)
+    query = db.query(Transaction.id).filter(Transaction.clean_merchant == merchant)
     if exclude_txn_id:
         query = query.filter(Transaction.id != exclude_txn_id)
 
-    return query.count() == 0
+    return query.first() is None
 
 
 def get_known_merchants_batch(db: Session) -> set:
@@ -159,9 +161,21 @@ def get_recurring_for_merchant(db: Session, merchant: str) -> Optional[Recurring
 
 def get_recurring_groups_by_merchant_batch(
     db: Session,
-) -> Dict[str, RecurringGroup]:
-    """Get all active recurring groups indexed by merchant pattern."""
-    recurring = db.query(RecurringGroup).filter(RecurringGroup.is_active == True).all()
+) -> Dict[str, Any]:
+    """
+    Get all active recurring groups indexed by merchant pattern.
+    Returns lightweight rows (id, merchant_pattern, expected_amount) rather
+    than ORM instances since alert analysis only reads those columns.
+    """
+    recurring = (
+        db.query(
+            RecurringGroup.id,
+            RecurringGroup.merchant_pattern,
+            RecurringGroup.expected_amount,
+        )
+        .filter(RecurringGroup.is_active == True)
+        .all()
+    )
     result = {}
     for r in recurring:
         pattern = r.merchant_pattern.lower()
@@ -180,7 +194,7 @@ def check_price_increase(
     db: Session,
     merchant: str,
     new_amount: float,
-    recurring_group: Optional[RecurringGroup],
+    recurring_group: Optional[Any],
 ) -> Optional[Dict[str, Any]]:
     """Check if this transaction represents a price increase from a recurring charge."""
     if not recurring_group:
@@ -233,12 +247,9 @@ def analyze_transaction_for_alerts_with_settings(
     if not is_likely_merchant(merchant):
         return None
 
-    category_avg = (
-        get_category_average(db, transaction.category_id)
-        if transaction.category_id
-        else 0
-    )
-    is_new_merchant = is_first_time_merchant(db, merchant, transaction.id)
+    # Each check below only hits the DB when its alert could actually fire:
+    # large-purchase needs a category and unusual-merchant needs an amount over
+    # the threshold, so most small uncategorized rows cost one recurring lookup.
     recurring = get_recurring_for_merchant(db, merchant)
     price_increase = check_price_increase(db, merchant, amount, recurring)
 
@@ -263,14 +274,21 @@ def analyze_transaction_for_alerts_with_settings(
         return alert
 
     multiplier = float(settings.large_purchase_multiplier)
+    category_avg = (
+        get_category_average(db, transaction.category_id)
+        if transaction.category_id
+        else 0
+    )
     if category_avg > 0 and amount > category_avg * multiplier:
         actual_multiplier = amount / category_avg
         severity = Severity.attention if actual_multiplier > 5 else Severity.warning
 
-        category = (
-            db.query(Category).filter(Category.id == transaction.category_id).first()
+        category_name = (
+            db.query(Category.name)
+            .filter(Category.id == transaction.category_id)
+            .scalar()
+            or "this category"
         )
-        category_name = category.name if category else "this category"
 
         alert = Alert(
             id=str(uuid.uuid4()),
@@ -290,7 +308,9 @@ def analyze_transaction_for_alerts_with_settings(
         return alert
 
     unusual_threshold = float(settings.unusual_merchant_threshold)
-    if is_new_merchant and amount > unusual_threshold:
+    if amount > unusual_threshold and is_first_time_merchant(
+        db, merchant, transaction.id
+    ):
         alert = Alert(
             id=str(uuid.uuid4()),
             type=AlertType.unusual_merchant,
@@ -313,16 +333,18 @@ def analyze_transaction_for_alerts_with_settings(
 
 def analyze_transactions_for_alerts_batch(
     db: Session,
-    transactions: List[Transaction],
+    transactions: List[Dict[str, Any]],
     settings: AlertSettings,
     category_averages: Dict[str, float],
     known_merchants: set,
-    recurring_by_merchant: Dict[str, RecurringGroup],
+    recurring_by_merchant: Dict[str, Any],
     category_names: Dict[str, str],
 ) -> List[Alert]:
     """
     Batch analyze transactions for alerts using pre-computed lookup dicts.
-    Avoids N queries per transaction during bulk import.
+    Transactions are the row dicts bulk-inserted by the import, so no ORM
+    instances are needed. Avoids N queries per transaction during bulk import.
+    Alerts are added to the session; the import commits them with its rows.
     """
     if not settings.alerts_enabled:
         return []
@@ -331,21 +353,19 @@ def analyze_transactions_for_alerts_batch(
     new_merchants = set()
 
     for transaction in transactions:
-        amount = abs(float(transaction.amount))
-        merchant = transaction.clean_merchant or transaction.raw_description
+        transaction_id = transaction["id"]
+        category_id = transaction.get("category_id")
+        amount = abs(float(transaction["amount"]))
+        merchant = transaction.get("clean_merchant") or transaction["raw_description"]
 
-        is_income = float(transaction.amount) > 0
+        is_income = float(transaction["amount"]) > 0
         if is_income:
             continue
 
         if not is_likely_merchant(merchant):
             continue
 
-        category_avg = (
-            category_averages.get(transaction.category_id, 0)
-            if transaction.category_id
-            else 0
-        )
+        category_avg = category_averages.get(category_id, 0) if category_id else 0
         is_new_merchant = merchant not in known_merchants
         if is_new_merchant:
             known_merchants.add(merchant)
@@ -368,7 +388,7 @@ def analyze_transactions_for_alerts_batch(
                 severity=Severity.warning,
                 title=f"Price increase: {merchant}",
                 description=f"Was ${price_increase['previous_amount']:.2f}/mo -> Now ${price_increase['new_amount']:.2f}/mo (+${price_increase['increase']:.2f})",
-                transaction_id=str(transaction.id),
+                transaction_id=str(transaction_id),
                 recurring_group_id=str(recurring.id) if recurring else None,
                 alert_metadata={
                     "previous_amount": price_increase["previous_amount"],
@@ -384,7 +404,7 @@ def analyze_transactions_for_alerts_batch(
         if category_avg > 0 and amount > category_avg * multiplier:
             actual_multiplier = amount / category_avg
             severity = Severity.attention if actual_multiplier > 5 else Severity.warning
-            category_name = category_names.get(transaction.category_id, "this category")
+            category_name = category_names.get(category_id, "this category")
 
             alert = Alert(
                 id=str(uuid.uuid4()),
@@ -392,7 +412,7 @@ def analyze_transactions_for_alerts_batch(
                 severity=severity,
                 title=f"Large purchase: {merchant}",
                 description=f"${amount:.2f} is {actual_multiplier:.1f}x your usual {category_name} spending of ${category_avg:.2f}",
-                transaction_id=str(transaction.id),
+                transaction_id=str(transaction_id),
                 alert_metadata={
                     "amount": amount,
                     "category_avg": category_avg,
@@ -410,7 +430,7 @@ def analyze_transactions_for_alerts_batch(
                 severity=Severity.info,
                 title=f"New merchant: {merchant}",
                 description=f"First purchase at {merchant}: ${amount:.2f}",
-                transaction_id=str(transaction.id),
+                transaction_id=str(transaction_id),
                 alert_metadata={
                     "amount": amount,
                     "threshold": unusual_threshold,
@@ -419,11 +439,9 @@ def analyze_transactions_for_alerts_batch(
             )
             alerts.append(alert)
 
-    for alert in alerts:
-        db.add(alert)
-
     if alerts:
-        db.commit()
+        db.add_all(alerts)
+        db.flush()
 
     return alerts
 
@@ -438,15 +456,16 @@ def get_alerts(
     """Get alerts with optional filters."""
     query = db.query(Alert)
 
-    if is_read is not None:
-        query = query.filter(Alert.is_read == is_read)
-
+    # Predicates follow the ix_alerts_feed column order
     if is_dismissed is not None:
         query = query.filter(Alert.is_dismissed == is_dismissed)
     else:
         # Default: hide dismissed
         query = query.filter(Alert.is_dismissed == False)
 
+    if is_read is not None:
+        query = query.filter(Alert.is_read == is_read)
+
     if alert_type:
         query = query.filter(Alert.type == alert_type)
 
@@ -456,19 +475,23 @@ def get_alerts(
 def get_unread_count(db: Session) -> int:
     """Get count of unread, non-dismissed alerts."""
     return (
-        db.query(Alert)
-        .filter(Alert.is_read == False, Alert.is_dismissed == False)
-        .count()
+        db.query(func.count(Alert.id))
+        .filter(Alert.is_dismissed == False, Alert.is_read == False)
+        .scalar()
     )
 
 
-def mark_all_read(db: Session) -> int:
-    """Mark all alerts as read. Returns count updated."""
-    result = (
-        db.query(Alert).filter(Alert.is_read == False).update({Alert.is_read: True})
+def mark_all_read(db: Session) -> List[str]:
+    """Mark all alerts as read. Returns the IDs that were updated."""
+    result = db.execute(
+        update(Alert)
+        .where(Alert.is_read == False)
+        .values(is_read=True)
+        .returning(Alert.id)
     )
+    alert_ids = [row[0] for row in result]
     db.commit()
-    return result
+    return alert_ids
 
 
 def create_new_recurring_alert(db: Session, recurring_group: RecurringGroup) -> Alert:
@@ -530,23 +553,20 @@ async def run_subscription_review(db: Session) -> Dict[str, Any]:
     total_yearly = total_monthly * 12
 
     # Prepare data for AI
-    recurring_json = json.dumps(
-        [
-            {
-                "id": str(r.id),
-                "name": r.name,
-                "merchant_pattern": r.merchant_pattern,
-                "amount": float(r.expected_amount) if r.expected_amount else 0,
-                "frequency": r.frequency.value,
-                "last_seen": r.last_seen_date.isoformat() if r.last_seen_date else None,
-                "next_expected": r.next_expected_date.isoformat()
-                if r.next_expected_date
-                else None,
-            }
-            for r in recurring
-        ],
-        indent=2,
-    )
+    recurring_data = [
+        {
+            "id": str(r.id),
+            "name": r.name,
+            "merchant_pattern": r.merchant_pattern,
+            "amount": float(r.expected_amount) if r.expected_amount else 0,
+            "frequency": r.frequency.value,
+            "last_seen": r.last_seen_date.isoformat() if r.last_seen_date else None,
+            "next_expected": r.next_expected_date.isoformat()
+            if r.next_expected_date
+            else None,
+        }
+        for r in recurring
+    ]
 
     # Get transaction activity (batch query to avoid N+1)
     cutoff = datetime.now() - timedelta(days=90)
@@ -567,7 +587,7 @@ async def run_subscription_review(db: Session) -> Dict[str, Any]:
         activity[str(group_id)] = count
 
     activity_by_name = {r.name: activity.get(str(r.id), 0) for r in recurring}
-    activity_json = json.dumps(activity_by_name, indent=2)
+    activity_json = json.dumps(activity_by_name)
 
     # Get last review date
     last_review = (
@@ -584,17 +604,25 @@ async def run_subscription_review(db: Session) -> Dict[str, Any]:
     client._db = db  # Set db session for privacy settings
 
     # Tokenize recurring data for privacy
-    tokenizer = TokenizationService(db)
-    recurring_data = json.loads(recurring_json)
-    tokenized_recurring = []
-    for r in recurring_data:
-        tokenized = dict(r)
-        if r.get("merchant_pattern"):
-            tokenized["merchant_pattern"] = tokenizer.tokenize_merchant(
-                r["merchant_pattern"]
+    with TokenizationService(db) as tokenizer:
+        # All missing tokens are created in one batch, returned in input order
+        pattern_tokens = iter(
+            tokenizer.tokenize_many(
+                [
+                    r["merchant_pattern"]
+                    for r in recurring_data
+                    if r.get("merchant_pattern")
+                ],
+                TokenType.merchant,
             )
-        tokenized_recurring.append(tokenized)
-    recurring_json_tokenized = json.dumps(tokenized_recurring, indent=2)
+        )
+        tokenized_recurring = []
+        for r in recurring_data:
+            tokenized = dict(r)
+            if r.get("merchant_pattern"):
+                tokenized["merchant_pattern"] = next(pattern_tokens)
+            tokenized_recurring.append(tokenized)
+        recurring_json_tokenized = json.dumps(tokenized_recurring)
 
     user_prompt = SUBSCRIPTION_REVIEW_USER.format(
         recurring_json=recurring_json_tokenized,
@@ -608,10 +636,11 @@ async def run_subscription_review(db: Session) -> Dict[str, Any]:
             user_prompt=user_prompt,
             temperature=0.3,
             max_tokens=2000,
+            schema=SubscriptionReviewResult,
         )
 
-        insights = result.get("insights", [])
-        summary = result.get("summary", "Review complete.")
+        insights = [insight.model_dump() for insight in result.insights]
+        summary = result.summary
 
         # De-tokenize AI response
         if insights:
@@ -719,32 +748,34 @@ async def detect_annual_charges(db: Session) -> List[Dict[str, Any]]:
     if len(transactions) < 10:
         return []
 
-    txn_json = json.dumps(
-        [
-            {
-                "id": str(t.id),
-                "date": t.date.isoformat(),
-                "amount": float(t.amount),
-                "merchant": t.clean_merchant or t.raw_description,
-            }
-            for t in transactions
-        ],
-        indent=2,
-    )
+    transactions_data = [
+        {
+            "id": str(t.id),
+            "date": t.date.isoformat(),
+            "amount": float(t.amount),
+            "merchant": t.clean_merchant or t.raw_description,
+        }
+        for t in transactions
+    ]
 
     client = get_ai_client()
     client._db = db  # Set db session for privacy settings
 
     # Tokenize transaction data for privacy
-    tokenizer = TokenizationService(db)
-    transactions_data = json.loads(txn_json)
-    tokenized_transactions = []
-    for t in transactions_data:
-        tokenized = dict(t)
-        if t.get("merchant"):
-            tokenized["merchant"] = tokenizer.tokenize_merchant(t["merchant"])
-        tokenized_transactions.append(tokenized)
-    txn_json_tokenized = json.dumps(tokenized_transactions, indent=2)
+    with TokenizationService(db) as tokenizer:
+        merchant_tokens = iter(
+            tokenizer.tokenize_many(
+                [t["merchant"] for t in transactions_data if t.get("merchant")],
+                TokenType.merchant,
+            )
+        )
+        tokenized_transactions = []
+        for t in transactions_data:
+            tokenized = dict(t)
+            if t.get("merchant"):
+                tokenized["merchant"] = next(merchant_tokens)
+            tokenized_transactions.append(tokenized)
+        txn_json_tokenized = json.dumps(tokenized_transactions)
 
     user_prompt = ANNUAL_CHARGE_DETECTION_USER.format(
         transactions_json=txn_json_tokenized, current_date=date.today().isoformat()
@@ -756,9 +787,10 @@ async def detect_annual_charges(db: Session) -> List[Dict[str, Any]]:
             user_prompt=user_prompt,
             temperature=0.1,
             max_tokens=1500,
+            schema=AnnualChargeDetectionResult,
         )
 
-        annual_subs = result.get("annual_subscriptions", [])
+        annual_subs = [sub.model_dump() for sub in result.annual_subscriptions]
 
         # De-tokenize AI response
         for sub in annual_subs:
@@ -773,10 +805,10 @@ async def detect_annual_charges(db: Session) -> List[Dict[str, Any]]:
     # Create alerts for upcoming annual charges
     created_alerts = []
     for sub in annual_subs:
-        if sub.get("confidence", 0) < 0.6:
+        if sub["confidence"] < 0.6:
             continue
 
-        predicted_date = sub.get("predicted_next_date")
+        predicted_date = sub["predicted_next_date"]
         if not predicted_date:
             continue
 
@@ -800,7 +832,7 @@ async def detect_annual_charges(db: Session) -> List[Dict[str, Any]]:
                     "amount": sub["amount"],
                     "predicted_date": predicted_date,
                     "days_until": days_until,
-                    "confidence": sub.get("confidence", 0),
+                    "confidence": sub["confidence"],
                 },
             )
             db.add(alert)
@@ -18,6 +18,7 @@ from app.ai.prompts.coach import (
     build_coach_prompt,
 )
 from app.services.tokenization_service import TokenizationService
+from app.models.token_map import TokenType
 from app.ai.sanitization import sanitize_for_prompt
 
 logger = logging.getLogger(__name__)
@@ -43,6 +44,11 @@ class CoachService:
         Returns:
             {response, conversation_id, message_id}
         """
+        context = await self._assemble_context(message)
+        # Commit the context's tokens before any conversation rows are added, so
+        # they are not held uncommitted through the AI call or undone by its rollback
+        self.tokenizer.commit()
+
         if conversation_id:
             conversation = (
                 self.db.query(Conversation)
@@ -67,8 +73,6 @@ class CoachService:
 
         history = self._get_conversation_history(conversation.id)
 
-        context = await self._assemble_context(message)
-
         sanitized_message = sanitize_for_prompt(message, max_length=2000)
         sanitized_history = [
             {
@@ -127,6 +131,11 @@ class CoachService:
         Yields:
             Dict with "type" field: "token" for text chunks, "done" for final metadata
         """
+        context = await self._assemble_context(message)
+        # Commit the context's tokens before any conversation rows are added, so
+        # they are not held uncommitted through the AI call or undone by its rollback
+        self.tokenizer.commit()
+
         if conversation_id:
             conversation = (
                 self.db.query(Conversation)
@@ -151,8 +160,6 @@ class CoachService:
 
         history = self._get_conversation_history(conversation.id)
 
-        context = await self._assemble_context(message)
-
         sanitized_message = sanitize_for_prompt(message, max_length=2000)
         sanitized_history = [
             {
@@ -274,10 +281,10 @@ class CoachService:
             c.id: c.name for c in self.db.query(Category.id, Category.name).all()
         }
 
-        result = []
-        for r in recurring:
-            token = self.tokenizer.tokenize_merchant(r.name)
+        tokens = self.tokenizer.tokenize_many([r.name for r in recurring], TokenType.merchant)
 
+        result = []
+        for r, token in zip(recurring, tokens):
             result.append(
                 {
                     "name": f"{token} [{categories.get(r.category_id, 'Unknown')}]",
@@ -352,11 +359,13 @@ class CoachService:
             c.id: c.name for c in self.db.query(Category.id, Category.name).all()
         }
 
-        result = []
-        for t in transactions:
-            merchant = t.clean_merchant or t.raw_description
-            token = self.tokenizer.tokenize_merchant(merchant)
+        tokens = self.tokenizer.tokenize_many(
+            [t.clean_merchant or t.raw_description for t in transactions],
+            TokenType.merchant,
+        )
 
+        result = []
+        for t, token in zip(transactions, tokens):
             result.append(
                 {
                     "date": t.date.isoformat(),
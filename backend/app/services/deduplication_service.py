@@ -5,12 +5,14 @@ Deduplication service for transactions.
 import hashlib
 from datetime import date
 from decimal import Decimal
-from typing import Optional, Set, List
+from typing import Optional, Set, List, Dict, Any
 
 from sqlalchemy.orm import Session
 
 from app.models.transaction import Transaction
 
+HASH_LOOKUP_BATCH_SIZE = 5000
+
 
 def generate_transaction_hash(
     txn_date: date, amount: Decimal, raw_description: str, account_id: str
@@ -19,14 +21,45 @@ def generate_transaction_hash(
     Generate SHA256 hash for deduplication.
     Uses date|amount|description|account_id
     """
-    components = [
-        txn_date.isoformat(),
-        str(amount),
-        raw_description.strip().lower(),
-        str(account_id),
-    ]
-    combined = "|".join(components)
-    return hashlib.sha256(combined.encode()).hexdigest()
+    return hashlib.sha256(
+        b"|".join(
+            (
+                txn_date.isoformat().encode(),
+                str(amount).encode(),
+                raw_description.strip().lower().encode(),
+                str(account_id).encode(),
+            )
+        )
+    ).hexdigest()
+
+
+def generate_transaction_hashes(
+    transactions: List[Dict[str, Any]], account_id: str
+) -> List[str]:
+    """
+    Hash parsed transaction dicts that all belong to one account.
+    Same output as generate_transaction_hash, but the account suffix is
+    encoded once for the whole batch and each distinct date only once.
+    """
+    sha256 = hashlib.sha256
+    account_suffix = b"|" + str(account_id).encode()
+    # Statements repeat dates heavily; isoformat+encode was a large share of the loop
+    date_prefixes: Dict[date, bytes] = {}
+
+    hashes = []
+    append = hashes.append
+    for txn in transactions:
+        txn_date = txn["date"]
+        prefix = date_prefixes.get(txn_date)
+        if prefix is None:
+            prefix = date_prefixes[txn_date] = txn_date.isoformat().encode() + b"|"
+        digest = sha256(prefix)
+        digest.update(str(txn["amount"]).encode())
+        digest.update(b"|")
+        digest.update(txn["raw_description"].strip().lower().encode())
+        digest.update(account_suffix)
+        append(digest.hexdigest())
+    return hashes
 
 
 def is_duplicate(db: Session, txn_hash: str) -> bool:
@@ -43,5 +76,47 @@ def get_existing_hashes(db: Session, hashes: List[str]) -> Set[str]:
     """
     if not hashes:
         return set()
-    existing = db.query(Transaction.hash).filter(Transaction.hash.in_(hashes)).all()
-    return {row[0] for row in existing}
+    existing: Set[str] = set()
+    # Chunked to stay under SQLite's bound-parameter limit on large imports
+    for start in range(0, len(hashes), HASH_LOOKUP_BATCH_SIZE):
+        chunk = hashes[start:start + HASH_LOOKUP_BATCH_SIZE]
+        rows = db.query(Transaction.hash).filter(Transaction.hash.in_(chunk)).all()
+        existing.update(row[0] for row in rows)
+    return existing
+
+
+def get_existing_hashes_for_account(
+    db: Session,
+    account_id: str,
+    transactions: List[Dict[str, Any]],
+    hashes: List[str],
+) -> Set[str]:
+    """
+    Batch check for existing hashes, narrowed by (date, amount) first.
+
+    A row can only be a duplicate if the account already has a transaction
+    with the same date and amount, so the hash lookup is limited to those
+    candidates - usually none. Served by the (account_id, date, amount) index.
+    """
+    if not transactions:
+        return set()
+
+    dates = [txn["date"] for txn in transactions]
+    stored = (
+        db.query(Transaction.date, Transaction.amount)
+        .filter(
+            Transaction.account_id == account_id,
+            Transaction.date.between(min(dates), max(dates)),
+        )
+        .all()
+    )
+    if not stored:
+        return set()
+
+    stored_keys = {(d, a) for d, a in stored}
+    candidates = [
+        txn_hash
+        for txn, txn_hash in zip(transactions, hashes)
+        if (txn["date"], txn["amount"]) in stored_keys
+    ]
+    return get_existing_hashes(db, candidates)
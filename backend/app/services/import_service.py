@@ -5,7 +5,7 @@ Optimized version with:
 - Batch deduplication check (single query)
 - Pre-fetched categories and corrections
 - Pre-fetched alert settings
-- Parallel AI calls with asyncio.gather
+- Parallel AI calls with asyncio.gather (bounded by ai_max_concurrency)
 - Consolidated process_import function
 - Proper logging instead of print()
 """
@@ -15,17 +15,21 @@ import re
 import uuid
 import shutil
 import logging
-import asyncio
 import json
 from pathlib import Path
-from typing import Dict, Any, List, Set, Optional
-from datetime import datetime
+from typing import BinaryIO, Dict, Any, List, Set, Optional
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from app.config import settings
+from app.ai.client import get_ai_client_with_db
+from app.concurrency import gather_bounded
+from app.ids import uuid7_strings
+from app.database import SessionLocal
 from app.models.transaction import Transaction
 from app.models.import_log import ImportLog
 from app.models.account import Account, AccountType
@@ -41,12 +45,13 @@ from app.schemas.import_file import (
 from app.parsers.csv_parser import CSVParser
 from app.parsers.ofx_parser import OFXParser
 from app.services.deduplication_service import (
-    generate_transaction_hash,
-    get_existing_hashes,
+    generate_transaction_hashes,
+    get_existing_hashes_for_account,
 )
 from app.services.ai_service import (
     detect_csv_format,
     clean_merchant_name,
+    build_categorization_system_prompt,
     categorize_transaction_with_context,
 )
 from app.services import rules_service
@@ -88,9 +93,19 @@ def get_or_create_account(
 logger = logging.getLogger(__name__)
 
 MAX_ROWS = 100000
+INSERT_BATCH_SIZE = 5000
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+PARSERS_BY_SUFFIX = {
+    ".csv": CSVParser,
+    ".ofx": OFXParser,
+    ".qfx": OFXParser,
+}
 
 
 def save_pending(db: Session, import_id: str, data: Dict[str, Any]) -> None:
+    # Expire abandoned uploads on write so the staging table stays small
+    stale_paths = _delete_stale_pending(db, settings.pending_import_ttl_hours)
     row = PendingImport(
         id=import_id,
         file_path=data.get("file_path", ""),
@@ -100,10 +115,16 @@ def save_pending(db: Session, import_id: str, data: Dict[str, Any]) -> None:
     )
     db.add(row)
     db.commit()
+    _remove_uploads(stale_paths)
 
 
 def get_pending(db: Session, import_id: str) -> Optional[Dict[str, Any]]:
-    row = db.query(PendingImport).filter(PendingImport.id == import_id).first()
+    cutoff = datetime.utcnow() - timedelta(hours=settings.pending_import_ttl_hours)
+    row = (
+        db.query(PendingImport)
+        .filter(PendingImport.id == import_id, PendingImport.created_at >= cutoff)
+        .first()
+    )
     if not row:
         return None
     data = json.loads(row.data_json) if row.data_json else {}
@@ -113,20 +134,44 @@ def get_pending(db: Session, import_id: str) -> Optional[Dict[str, Any]]:
     return data
 
 
-def delete_pending(db: Session, import_id: str) -> None:
-    row = db.query(PendingImport).filter(PendingImport.id == import_id).first()
-    if row:
-        db.delete(row)
+def delete_pending(db: Session, import_id: str, commit: bool = True) -> None:
+    db.query(PendingImport).filter(PendingImport.id == import_id).delete()
+    if commit:
         db.commit()
 
 
-def cleanup_stale_pending(db: Session, max_age_hours: int = 24) -> int:
-    from datetime import timedelta
+def _delete_stale_pending(db: Session, max_age_hours: int) -> List[str]:
+    """
+    Delete expired pending rows without committing; return their upload paths.
 
+    Rows whose import is still processing are kept: the background job may
+    still be reading the file, and process_import deletes the row when done.
+    """
     cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
-    count = db.query(PendingImport).filter(PendingImport.created_at < cutoff).delete()
+    running = (
+        select(ImportLog.id)
+        .where(ImportLog.id == PendingImport.id, ImportLog.status == ImportStatus.PROCESSING)
+        .exists()
+    )
+    stale = db.query(PendingImport).filter(PendingImport.created_at < cutoff, ~running)
+    file_paths = [path for (path,) in stale.with_entities(PendingImport.file_path)]
+    stale.delete(synchronize_session=False)
+    return file_paths
+
+
+def _remove_uploads(file_paths: List[str]) -> None:
+    """Remove abandoned uploads from the inbox; call only after the delete commits."""
+    for path in file_paths:
+        if path:
+            Path(path).unlink(missing_ok=True)
+
+
+def cleanup_stale_pending(db: Session, max_age_hours: int = 24) -> int:
+    """Expire abandoned uploads and their inbox files. Returns rows removed."""
+    file_paths = _delete_stale_pending(db, max_age_hours)
     db.commit()
-    return count
+    _remove_uploads(file_paths)
+    return len(file_paths)
 
 
 def sanitize_filename(filename: str) -> str:
@@ -145,17 +190,51 @@ def sanitize_filename(filename: str) -> str:
     return safe_name
 
 
+def bulk_insert_transactions(db: Session, rows: List[Dict[str, Any]]) -> Set[str]:
+    """
+    Insert transaction rows in executemany batches.
+    Skips per-object unit-of-work bookkeeping, which dominates large imports.
+
+    Rows whose hash already exists are ignored by the unique index
+    (INSERT ... ON CONFLICT DO NOTHING), so a concurrent import of the same
+    file cannot fail the batch. Returns the IDs that were actually inserted.
+    """
+    stmt = (
+        sqlite_insert(Transaction)
+        .on_conflict_do_nothing(index_elements=["hash"])
+        .returning(Transaction.id)
+    )
+    inserted_ids: Set[str] = set()
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        result = db.execute(stmt, rows[start : start + INSERT_BATCH_SIZE])
+        inserted_ids.update(row[0] for row in result)
+    return inserted_ids
+
+
+def archive_upload(file_path: Path, dest_dir: Path) -> Path:
+    """Move a processed upload out of the inbox, renaming in place when possible."""
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest = dest_dir / file_path.name
+    try:
+        os.replace(file_path, dest)
+    except OSError:
+        # Different mount: falls back to a full copy + unlink
+        logger.warning(
+            f"Inbox and {dest_dir} are on different filesystems; copying {file_path.name}"
+        )
+        shutil.move(str(file_path), str(dest))
+    return dest
+
+
 def get_parser(file_path: Path):
     """Get appropriate parser for file type"""
-    parsers = [CSVParser(), OFXParser()]
-    for parser in parsers:
-        if parser.can_parse(file_path):
-            return parser
-    return None
+    # Fresh instance per call: OFXParser caches the last parsed document
+    parser_cls = PARSERS_BY_SUFFIX.get(file_path.suffix.lower())
+    return parser_cls() if parser_cls else None
 
 
-def save_upload(file_content: bytes, filename: str):
-    """Save uploaded file and return path and import_id"""
+def save_upload(source: BinaryIO, filename: str):
+    """Stream an uploaded file to the inbox and return path and import_id"""
     import_id = str(uuid.uuid4())
 
     inbox_path = Path(settings.import_inbox_path)
@@ -166,7 +245,7 @@ def save_upload(file_content: bytes, filename: str):
     file_path = inbox_path / safe_filename
 
     with open(file_path, "wb") as f:
-        f.write(file_content)
+        shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
 
     return file_path, import_id
 
@@ -181,16 +260,7 @@ def get_preview(
 
     headers, preview_rows = parser.get_preview(file_path)
 
-    row_count = 0
-    if isinstance(parser, CSVParser):
-        with open(file_path, "r", encoding="utf-8-sig") as f:
-            row_count = sum(1 for _ in f) - 1
-    else:
-        with open(file_path, "rb") as f:
-            from ofxparse import OfxParser
-
-            ofx = OfxParser.parse(f)
-            row_count = sum(len(acc.statement.transactions) for acc in ofx.accounts)
+    row_count = parser.count_rows(file_path)
 
     save_pending(
         db,
@@ -227,7 +297,6 @@ async def get_preview_with_ai(
     detected_format = None
     saved_format = None
     balance = None
-    row_count = 0
     header_fingerprint = None
 
     if isinstance(parser, CSVParser):
@@ -266,15 +335,10 @@ async def get_preview_with_ai(
             }
 
         detected_format = await detect_csv_format(db, headers, preview_rows)
-        with open(file_path, "r", encoding="utf-8-sig") as f:
-            row_count = sum(1 for _ in f) - 1
     else:
         balance = parser.extract_balance(file_path)
-        with open(file_path, "rb") as f:
-            from ofxparse import OfxParser
 
-            ofx = OfxParser.parse(f)
-            row_count = sum(len(acc.statement.transactions) for acc in ofx.accounts)
+    row_count = parser.count_rows(file_path)
 
     save_pending(
         db,
@@ -304,29 +368,21 @@ async def get_preview_with_ai(
     )
 
 
-async def process_import(
-    db: Session, import_id: str, request: ImportConfirmRequest, use_ai: bool = True
-) -> ImportStatusResponse:
-    """
-    Process an import with optional AI categorization.
+class ImportConflictError(Exception):
+    """Raised when an import is confirmed while it is running or already done."""
 
-    Supports two modes:
-    1. Single account: account_id provided, all transactions go to that account
-    2. Multi-account: account_col provided, auto-create accounts from CSV
 
-    Optimizations:
-    - Batch deduplication check (single query)
-    - Pre-fetched categories and corrections
-    - Pre-fetched alert settings
-    - Parallel AI calls with asyncio.gather
+def _begin_import(db: Session, import_id: str, request: ImportConfirmRequest):
+    """
+    Validate a confirm request and record the import as processing.
+
+    Reuses the import log when start_import already created it, so a
+    queued job does not insert it twice.
     """
     pending = get_pending(db, import_id)
     if pending is None:
         raise ValueError(f"Import {import_id} not found or expired")
 
-    file_path = Path(pending["file_path"])
-    filename = pending["filename"]
-
     has_account_col = request.column_mapping.account_col is not None
     multi_account_mode = has_account_col and request.auto_create_accounts
 
@@ -341,14 +397,83 @@ async def process_import(
         if not default_account:
             raise ValueError(f"Account {request.account_id} not found")
 
-    import_log = ImportLog(
-        id=import_id,
-        filename=filename,
-        account_id=request.account_id,
+    import_log = db.query(ImportLog).filter(ImportLog.id == import_id).first()
+    if import_log is None:
+        import_log = ImportLog(
+            id=import_id,
+            filename=pending["filename"],
+            account_id=request.account_id,
+            status=ImportStatus.PROCESSING,
+        )
+        db.add(import_log)
+        db.commit()
+    elif import_log.status == ImportStatus.FAILED:
+        # Retrying a job that failed before it started processing rows
+        import_log.status = ImportStatus.PROCESSING
+        import_log.error_message = None
+        db.commit()
+
+    return pending, default_account, import_log
+
+
+def start_import(
+    db: Session, import_id: str, request: ImportConfirmRequest
+) -> ImportStatusResponse:
+    """Accept an import for background processing and return its initial status."""
+    status = db.query(ImportLog.status).filter(ImportLog.id == import_id).scalar()
+    if status is not None and status != ImportStatus.FAILED:
+        raise ImportConflictError(f"Import {import_id} is already {status.value}")
+
+    _, _, import_log = _begin_import(db, import_id, request)
+    return ImportStatusResponse(
+        import_id=import_id,
         status=ImportStatus.PROCESSING,
+        filename=import_log.filename,
     )
-    db.add(import_log)
-    db.commit()
+
+
+async def run_import_job(import_id: str, request: ImportConfirmRequest) -> None:
+    """Background entry point: run the AI import in its own session."""
+    db = SessionLocal()
+    try:
+        await process_import(db, import_id, request, use_ai=True)
+    except Exception as e:
+        logger.exception(f"Background import {import_id} failed")
+        # process_import marks its own failures; validation errors raised before
+        # it starts (expired upload, deleted account) would leave the log processing
+        db.rollback()
+        import_log = db.get(ImportLog, import_id)
+        if import_log is not None and import_log.status != ImportStatus.FAILED:
+            import_log.status = ImportStatus.FAILED
+            import_log.error_message = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+
+async def process_import(
+    db: Session, import_id: str, request: ImportConfirmRequest, use_ai: bool = True
+) -> ImportStatusResponse:
+    """
+    Process an import with optional AI categorization.
+
+    Supports two modes:
+    1. Single account: account_id provided, all transactions go to that account
+    2. Multi-account: account_col provided, auto-create accounts from CSV
+
+    Optimizations:
+    - Batch deduplication check (single query)
+    - Pre-fetched categories and corrections
+    - Pre-fetched alert settings
+    - Parallel AI calls with asyncio.gather
+    """
+    pending, default_account, import_log = _begin_import(db, import_id, request)
+
+    file_path = Path(pending["file_path"])
+    filename = pending["filename"]
+
+    has_account_col = request.column_mapping.account_col is not None
+    multi_account_mode = has_account_col and request.auto_create_accounts
 
     try:
         parser = get_parser(file_path)
@@ -385,8 +510,9 @@ async def process_import(
         elif default_account:
             account_cache["default"] = default_account
 
-        for txn_data in transactions_data:
-            if multi_account_mode:
+        txns_by_account: Dict[str, List[Dict[str, Any]]] = {}
+        if multi_account_mode:
+            for txn_data in transactions_data:
                 account_name = txn_data.get("account_name", "Unknown Account")
                 account = account_cache.get(account_name)
                 if not account:
@@ -396,28 +522,43 @@ async def process_import(
                     account_cache[account_name] = account
                 txn_data["_account_id"] = account.id
                 txn_data["_account_type"] = account.account_type.value
-            else:
-                txn_data["_account_id"] = request.account_id
-                txn_data["_account_type"] = (
-                    default_account.account_type.value
-                    if default_account
-                    else "checking"
-                )
-
-            txn_hash = generate_transaction_hash(
-                txn_data["date"],
-                txn_data["amount"],
-                txn_data["raw_description"],
-                txn_data["_account_id"],
+                txns_by_account.setdefault(account.id, []).append(txn_data)
+        else:
+            # One account for every row: resolve its id and type once
+            account_id = request.account_id
+            account_type = (
+                default_account.account_type.value if default_account else "checking"
+            )
+            for txn_data in transactions_data:
+                txn_data["_account_id"] = account_id
+                txn_data["_account_type"] = account_type
+            if transactions_data:
+                txns_by_account[account_id] = transactions_data
+
+        # Account ID is constant per group, so it is encoded once per account
+        existing_hashes: Set[str] = set()
+        for account_id, account_txns in txns_by_account.items():
+            hashes = generate_transaction_hashes(account_txns, account_id)
+            for txn_data, txn_hash in zip(account_txns, hashes):
+                txn_data["_hash"] = txn_hash
+            existing_hashes |= get_existing_hashes_for_account(
+                db, account_id, account_txns, hashes
             )
-            txn_data["_hash"] = txn_hash
-
-        all_hashes = [txn["_hash"] for txn in transactions_data]
-        existing_hashes = get_existing_hashes(db, all_hashes)
         logger.info(
-            f"Batch dedup: {len(existing_hashes)} of {len(all_hashes)} already exist"
+            f"Batch dedup: {len(existing_hashes)} of {len(transactions_data)} already exist"
         )
 
+        # Single pass against the pre-fetched set; also drops repeats within
+        # the file itself, which would otherwise violate the unique hash index
+        seen_hashes = set(existing_hashes)
+        new_txns = []
+        for txn_data in transactions_data:
+            if txn_data["_hash"] in seen_hashes:
+                continue
+            seen_hashes.add(txn_data["_hash"])
+            new_txns.append(txn_data)
+        skipped = len(transactions_data) - len(new_txns)
+
         categories = None
         corrections = None
         alert_settings = None
@@ -453,40 +594,54 @@ async def process_import(
         category_names = get_category_names_batch(db)
 
         imported = 0
-        skipped = 0
         errors = []
-        transactions_to_alert = []
+        transaction_rows: List[Dict[str, Any]] = []
+        transaction_ids = iter(uuid7_strings(len(new_txns)))
 
         if use_ai and settings.ai_auto_categorize:
-            new_txns = [
-                t for t in transactions_data if t["_hash"] not in existing_hashes
-            ]
-
             if new_txns:
-                unique_descriptions = list(set(t["raw_description"] for t in new_txns))
+                # Descriptions that differ only in case/whitespace (the same
+                # normalization as the dedup hash) share one cleaning call
+                unique_descriptions: Dict[str, str] = {}
+                for txn_data in new_txns:
+                    merchant_key = txn_data["raw_description"].strip().lower()
+                    txn_data["_merchant_key"] = merchant_key
+                    unique_descriptions.setdefault(
+                        merchant_key, txn_data["raw_description"]
+                    )
                 merchant_tasks = [
-                    clean_merchant_name(db, desc) for desc in unique_descriptions
+                    clean_merchant_name(db, desc)
+                    for desc in unique_descriptions.values()
                 ]
-                clean_merchants = await asyncio.gather(
-                    *merchant_tasks, return_exceptions=True
+                clean_merchants = await gather_bounded(
+                    merchant_tasks, settings.ai_max_concurrency
                 )
 
                 merchant_map = {}
-                for desc, result in zip(unique_descriptions, clean_merchants):
+                for (merchant_key, desc), result in zip(
+                    unique_descriptions.items(), clean_merchants
+                ):
                     if isinstance(result, Exception):
                         logger.warning(
                             f"Merchant cleaning failed for {desc[:30]}: {result}"
                         )
-                        merchant_map[desc] = None
+                        merchant_map[merchant_key] = None
                     else:
-                        merchant_map[desc] = result
+                        merchant_map[merchant_key] = result
 
+                # Rows sharing a clean merchant (or, when cleaning produced
+                # nothing, the same raw description) share one AI call
                 merchant_category_cache: Dict[str, Optional[str]] = {}
+                # One client and one rendered system prompt serve every call
+                categorize_client = get_ai_client_with_db(db, task="categorize")
+                categorize_system_prompt = build_categorization_system_prompt(
+                    categories, corrections
+                )
                 categorize_tasks = []
-                merchants_to_categorize = []
+                merchants_to_categorize: Set[str] = set()
                 txns_need_ai = []
                 for txn_data in new_txns:
-                    clean_merchant = merchant_map.get(txn_data["raw_description"])
+                    clean_merchant = merchant_map.get(txn_data["_merchant_key"])
 
                     rule_category_id = rules_service.apply_rules(
                         db,
@@ -499,23 +654,22 @@ async def process_import(
                         txn_data["_rule_category_id"] = rule_category_id
                         txn_data["_clean_merchant"] = clean_merchant
                     else:
-                        if clean_merchant and clean_merchant in merchant_category_cache:
-                            cached_cat = merchant_category_cache[clean_merchant]
+                        categorize_key = clean_merchant or txn_data["raw_description"]
+                        txn_data["_categorize_key"] = categorize_key
+                        if categorize_key in merchant_category_cache:
+                            cached_cat = merchant_category_cache[categorize_key]
                             if cached_cat:
                                 txn_data["_cached_category_id"] = cached_cat
                                 txn_data["_clean_merchant"] = clean_merchant
                                 continue
-                        elif (
-                            clean_merchant and clean_merchant in merchants_to_categorize
-                        ):
+                        elif categorize_key in merchants_to_categorize:
                             txn_data["_pending_ai"] = True
                             txn_data["_clean_merchant"] = clean_merchant
                             txns_need_ai.append(txn_data)
                             continue
 
                         txns_need_ai.append(txn_data)
-                        if clean_merchant:
-                            merchants_to_categorize.append(clean_merchant)
+                        merchants_to_categorize.add(categorize_key)
                         categorize_tasks.append(
                             categorize_transaction_with_context(
                                 db=db,
@@ -524,13 +678,13 @@ async def process_import(
                                 amount=float(txn_data["amount"]),
                                 date=str(txn_data["date"]),
                                 account_type=txn_data["_account_type"],
-                                categories=categories,
-                                corrections=corrections,
+                                client=categorize_client,
+                                system_prompt=categorize_system_prompt,
                             )
                         )
 
-                category_results = await asyncio.gather(
-                    *categorize_tasks, return_exceptions=True
+                category_results = await gather_bounded(
+                    categorize_tasks, settings.ai_max_concurrency
                 )
 
                 ai_category_map = {}
@@ -542,31 +696,26 @@ async def process_import(
                         if cat_result.get("confidence", 0) > 0.5:
                             cat_id = cat_result.get("category_id")
                             ai_category_map[txn_data["_hash"]] = cat_id
-                            clean_merchant = txn_data.get(
-                                "_clean_merchant"
-                            ) or merchant_map.get(txn_data["raw_description"])
-                            if clean_merchant and cat_id:
-                                merchant_category_cache[clean_merchant] = cat_id
+                            if cat_id:
+                                merchant_category_cache[
+                                    txn_data["_categorize_key"]
+                                ] = cat_id
                     elif isinstance(cat_result, Exception):
                         logger.warning(f"Categorization failed: {cat_result}")
 
                 for txn_data in txns_need_ai:
                     if "_pending_ai" in txn_data:
-                        clean_merchant = txn_data.get("_clean_merchant")
-                        if clean_merchant and clean_merchant in merchant_category_cache:
+                        categorize_key = txn_data["_categorize_key"]
+                        if categorize_key in merchant_category_cache:
                             ai_category_map[txn_data["_hash"]] = (
-                                merchant_category_cache[clean_merchant]
+                                merchant_category_cache[categorize_key]
                             )
 
                 for txn_data in new_txns:
                     txn_hash = txn_data["_hash"]
 
-                    if txn_hash in existing_hashes:
-                        skipped += 1
-                        continue
-
                     try:
-                        clean_merchant = merchant_map.get(txn_data["raw_description"])
+                        clean_merchant = merchant_map.get(txn_data["_merchant_key"])
 
                         category_id = None
                         ai_categorized = False
@@ -582,68 +731,63 @@ async def process_import(
                             category_id = ai_category_map[txn_hash]
                             ai_categorized = True
 
-                        transaction = Transaction(
-                            id=str(uuid.uuid4()),
-                            hash=txn_hash,
-                            date=txn_data["date"],
-                            amount=txn_data["amount"],
-                            raw_description=txn_data["raw_description"],
-                            clean_merchant=clean_merchant,
-                            category_id=category_id,
-                            account_id=txn_data["_account_id"],
-                            ai_categorized=ai_categorized,
+                        transaction_rows.append(
+                            {
+                                "id": next(transaction_ids),
+                                "hash": txn_hash,
+                                "date": txn_data["date"],
+                                "amount": txn_data["amount"],
+                                "raw_description": txn_data["raw_description"],
+                                "clean_merchant": clean_merchant,
+                                "category_id": category_id,
+                                "account_id": txn_data["_account_id"],
+                                "ai_categorized": ai_categorized,
+                            }
                         )
-                        db.add(transaction)
-                        transactions_to_alert.append(transaction)
                         imported += 1
 
                     except Exception as e:
                         logger.error(f"Error creating transaction: {e}")
                         errors.append(str(e))
-            else:
-                skipped = len(existing_hashes)
         else:
-            for txn_data in transactions_data:
-                txn_hash = txn_data["_hash"]
-
-                if txn_hash in existing_hashes:
-                    skipped += 1
-                    continue
-
-                try:
-                    transaction = Transaction(
-                        id=str(uuid.uuid4()),
-                        hash=txn_hash,
-                        date=txn_data["date"],
-                        amount=txn_data["amount"],
-                        raw_description=txn_data["raw_description"],
-                        account_id=txn_data["_account_id"],
-                        ai_categorized=False,
-                    )
-                    db.add(transaction)
-                    transactions_to_alert.append(transaction)
-                    imported += 1
-                except Exception as e:
-                    logger.error(f"Error creating transaction: {e}")
-                    errors.append(str(e))
+            transaction_rows = [
+                {
+                    "id": txn_id,
+                    "hash": txn_data["_hash"],
+                    "date": txn_data["date"],
+                    "amount": txn_data["amount"],
+                    "raw_description": txn_data["raw_description"],
+                    "clean_merchant": None,
+                    "category_id": None,
+                    "account_id": txn_data["_account_id"],
+                    "ai_categorized": False,
+                }
+                for txn_data, txn_id in zip(new_txns, transaction_ids)
+            ]
+            imported = len(transaction_rows)
 
-        db.commit()
+        inserted_ids = bulk_insert_transactions(db, transaction_rows)
+        if len(inserted_ids) < len(transaction_rows):
+            # Another import wrote some of these hashes after our dedup check
+            transaction_rows = [r for r in transaction_rows if r["id"] in inserted_ids]
+            skipped += imported - len(transaction_rows)
+            imported = len(transaction_rows)
 
+        # Savepoint so a failed alert pass does not discard the imported rows
         try:
-            analyze_transactions_for_alerts_batch(
-                db,
-                transactions_to_alert,
-                alert_settings,
-                category_averages,
-                known_merchants,
-                recurring_by_merchant,
-                category_names,
-            )
+            with db.begin_nested():
+                analyze_transactions_for_alerts_batch(
+                    db,
+                    transaction_rows,
+                    alert_settings,
+                    category_averages,
+                    known_merchants,
+                    recurring_by_merchant,
+                    category_names,
+                )
         except Exception as e:
             logger.warning(f"Batch alert analysis failed: {e}")
 
-        db.commit()
-
         if (
             not multi_account_mode
             and request.update_balance
@@ -654,7 +798,6 @@ async def process_import(
             if account:
                 account.current_balance = Decimal(str(request.new_balance))
                 account.balance_updated_at = datetime.utcnow()
-                db.commit()
                 logger.info(
                     f"Updated balance for account {account.name} to {request.new_balance}"
                 )
@@ -678,7 +821,6 @@ async def process_import(
                     logger.warning(
                         f"Failed to calculate balance for account {account_id}: {e}"
                     )
-            db.commit()
         elif request.account_id:
             from app.services.balance_inference import (
                 calculate_balance_from_transactions,
@@ -697,13 +839,15 @@ async def process_import(
                 logger.warning(
                     f"Failed to calculate balance for account {request.account_id}: {e}"
                 )
-            db.commit()
 
         import_log.status = ImportStatus.COMPLETED
         import_log.transactions_imported = imported
         import_log.transactions_skipped = skipped
         if errors:
             import_log.error_message = "; ".join(errors[:10])
+        delete_pending(db, import_id, commit=False)
+
+        # Rows, alerts, balances and the log land in a single commit
         db.commit()
 
         if (
@@ -716,11 +860,7 @@ async def process_import(
             except Exception as e:
                 logger.warning(f"Failed to auto-save format: {e}")
 
-        processed_path = Path(settings.import_processed_path)
-        processed_path.mkdir(parents=True, exist_ok=True)
-        shutil.move(str(file_path), str(processed_path / file_path.name))
-
-        delete_pending(db, import_id)
+        archive_upload(file_path, Path(settings.import_processed_path))
 
         try:
             check_all_budget_alerts(db)
@@ -742,15 +882,13 @@ async def process_import(
 
     except Exception as e:
         logger.error(f"Import failed: {e}")
+        db.rollback()
         import_log.status = ImportStatus.FAILED
         import_log.error_message = str(e)
+        delete_pending(db, import_id, commit=False)
         db.commit()
 
-        failed_path = Path(settings.import_failed_path)
-        failed_path.mkdir(parents=True, exist_ok=True)
-        shutil.move(str(file_path), str(failed_path / file_path.name))
-
-        delete_pending(db, import_id)
+        archive_upload(file_path, Path(settings.import_failed_path))
 
         raise
 
@@ -787,29 +925,37 @@ def _get_cached_categorizations(
     if not merchants:
         return {}
 
-    normalized_merchants = [m.strip().upper() for m in merchants]
+    normalized_by_merchant = {m: m.strip().upper() for m in merchants}
 
     cached = (
-        db.query(TokenMap)
+        db.query(
+            TokenMap.normalized_value,
+            TokenMap.original_value,
+            TokenMap.metadata_,
+        )
         .filter(
             TokenMap.token_type == TokenType.merchant,
-            TokenMap.normalized_value.in_(normalized_merchants),
+            TokenMap.normalized_value.in_(set(normalized_by_merchant.values())),
         )
         .all()
     )
 
-    cached_by_normalized = {tm.normalized_value: tm for tm in cached}
+    cached_by_normalized = {
+        normalized: (original, metadata)
+        for normalized, original, metadata in cached
+        if metadata
+    }
 
     result = {}
-    for merchant in merchants:
-        normalized = merchant.strip().upper()
-        token_map = cached_by_normalized.get(normalized)
-        if token_map and token_map.metadata_:
+    for merchant, normalized in normalized_by_merchant.items():
+        hit = cached_by_normalized.get(normalized)
+        if hit:
+            original, metadata = hit
             result[merchant] = {
                 "raw": merchant,
-                "clean": token_map.original_value,
-                "category": token_map.metadata_.get("category"),
-                "subcategory": token_map.metadata_.get("subcategory"),
+                "clean": original,
+                "category": metadata.get("category"),
+                "subcategory": metadata.get("subcategory"),
             }
 
     return result
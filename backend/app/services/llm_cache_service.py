@@ -0,0 +1,56 @@
+"""
+Exact-match cache for AI JSON responses.
+
+Keys are a digest of the model and both prompts, so any change to the
+data, the prompt template or the model is a miss.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.llm_response_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(model: str, system_prompt: str, user_prompt: str) -> str:
+    """Stable 128-bit hex digest for one completion request."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model, system_prompt, user_prompt):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_cached_many(db: Session, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Look up unexpired responses for several keys in one query."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    cutoff = datetime.utcnow() - timedelta(hours=settings.llm_cache_ttl_hours)
+    rows = (
+        db.query(LLMResponseCache.key, LLMResponseCache.response_json)
+        .filter(LLMResponseCache.key.in_(keys), LLMResponseCache.created_at >= cutoff)
+        .all()
+    )
+    return {key: json.loads(response_json) for key, response_json in rows}
+
+
+def store_many(db: Session, responses: Dict[str, Dict[str, Any]]) -> None:
+    """Save responses, replacing any stale entry, and prune expired rows."""
+    if not responses:
+        return
+    cutoff = datetime.utcnow() - timedelta(hours=settings.llm_cache_ttl_hours)
+    db.query(LLMResponseCache).filter(LLMResponseCache.created_at < cutoff).delete()
+    now = datetime.utcnow()
+    for key, response in responses.items():
+        db.merge(
+            LLMResponseCache(key=key, response_json=json.dumps(response), created_at=now)
+        )
+    db.commit()
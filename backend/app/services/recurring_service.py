@@ -1,24 +1,33 @@
 """Service for recurring transaction detection and management."""
 
 import logging
+from functools import lru_cache
 from typing import List, Optional, Dict, Any
 from datetime import date, timedelta
 from decimal import Decimal
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import Float, cast, func, select, update
 import json
-import uuid
 
 from app.models.recurring import RecurringGroup, Frequency
 from app.models.transaction import Transaction
 from app.ai.client import get_ai_client
 from app.ai.prompts import RECURRING_DETECTION_SYSTEM, RECURRING_DETECTION_USER
 from app.ai.sanitization import sanitize_for_prompt
+from app.concurrency import gather_bounded
 from app.config import settings
+from app.ids import new_id
+from app.services import llm_cache_service
 from app.services.tokenization_service import TokenizationService
 
 logger = logging.getLogger(__name__)
 
+# A merchant needs this many uncategorized charges before it is sent for detection
+MIN_RECURRING_OCCURRENCES = 3
+
+# Transactions per detection prompt; larger histories fan out over several calls
+RECURRING_SHARD_SIZE = 200
+
 
 async def detect_recurring_patterns(db: Session) -> List[Dict[str, Any]]:
     """
@@ -26,14 +35,31 @@ async def detect_recurring_patterns(db: Session) -> List[Dict[str, Any]]:
     Returns list of detected patterns with transaction IDs.
     """
     cutoff_date = date.today() - timedelta(days=365 * 3)
+    candidate_filter = (
+        Transaction.date >= cutoff_date,
+        Transaction.amount < 0,
+        Transaction.recurring_group_id.is_(None),
+    )
+
+    # Only merchants seen often enough to recur are worth prompt tokens
+    merchant_key = func.coalesce(Transaction.clean_merchant, Transaction.raw_description)
+    candidate_merchants = (
+        select(merchant_key)
+        .where(*candidate_filter)
+        .group_by(merchant_key)
+        .having(func.count(Transaction.id) >= MIN_RECURRING_OCCURRENCES)
+    )
 
     transactions = (
-        db.query(Transaction)
-        .filter(
-            Transaction.date >= cutoff_date,
-            Transaction.amount < 0,
-            Transaction.recurring_group_id.is_(None),
+        db.query(
+            Transaction.id,
+            Transaction.date,
+            # The prompt only needs a float; skip building a Decimal per row
+            cast(Transaction.amount, Float).label("amount"),
+            Transaction.clean_merchant,
+            Transaction.raw_description,
         )
+        .filter(*candidate_filter, merchant_key.in_(candidate_merchants))
         .order_by(Transaction.date.desc())
         .all()
     )
@@ -41,41 +67,77 @@ async def detect_recurring_patterns(db: Session) -> List[Dict[str, Any]]:
     if len(transactions) < 5:
         return []
 
-    token_service = TokenizationService(db)
-
-    txn_data = []
-    for t in transactions:
-        tokenized = token_service.tokenize_transaction_for_ai(
-            {
-                "id": str(t.id),
-                "date": t.date.isoformat(),
-                "amount": float(t.amount),
-                "merchant": t.clean_merchant or t.raw_description,
-            },
+    # New tokens are committed before any prompt that uses them goes out
+    with TokenizationService(db) as token_service:
+        tokenized_txns = token_service.tokenize_transactions_for_ai(
+            [
+                {
+                    "id": str(t.id),
+                    "date": t.date,
+                    "amount": t.amount,
+                    "merchant": t.clean_merchant or t.raw_description,
+                }
+                for t in transactions
+            ],
             include_category=False,
         )
-        txn_data.append(tokenized)
 
-    client = get_ai_client()
+    # Keep each merchant's charges together so a shard sees its whole history
+    by_merchant: Dict[str, List[Dict[str, Any]]] = {}
+    for tokenized in tokenized_txns:
+        by_merchant.setdefault(tokenized["merchant"], []).append(tokenized)
 
-    user_prompt = RECURRING_DETECTION_USER.format(
-        transactions_json=json.dumps(txn_data, indent=2)
-    )
+    # Pack in token order, not recency: a new charge then only changes its own
+    # shard's key instead of moving every later shard boundary
+    shards: List[List[Dict[str, Any]]] = [[]]
+    for _, merchant_txns in sorted(by_merchant.items()):
+        if shards[-1] and len(shards[-1]) + len(merchant_txns) > RECURRING_SHARD_SIZE:
+            shards.append([])
+        shards[-1].extend(merchant_txns)
 
-    try:
-        result = await client.complete_json(
-            system_prompt=RECURRING_DETECTION_SYSTEM,
-            user_prompt=user_prompt,
-            temperature=0.1,
-            max_tokens=2000,
+    client = get_ai_client()
+    prompts = [
+        RECURRING_DETECTION_USER.format(transactions_json=json.dumps(shard))
+        for shard in shards
+    ]
+    keys = [
+        llm_cache_service.make_key(client.model, RECURRING_DETECTION_SYSTEM, prompt)
+        for prompt in prompts
+    ]
+    cached = llm_cache_service.get_cached_many(db, keys)
+
+    # Only shards whose data changed since the last run go to the model
+    misses = [i for i, key in enumerate(keys) if key not in cached]
+    responses = await gather_bounded(
+        [
+            client.complete_json(
+                system_prompt=RECURRING_DETECTION_SYSTEM,
+                user_prompt=prompts[i],
+                temperature=0.1,
+                max_tokens=2000,
+            )
+            for i in misses
+        ],
+        settings.ai_max_concurrency,
+    )
+    fresh: Dict[str, Dict[str, Any]] = {}
+    for i, response in zip(misses, responses):
+        if isinstance(response, Exception):
+            logger.warning(f"Recurring detection failed: {response}")
+        else:
+            fresh[keys[i]] = response
+    llm_cache_service.store_many(db, fresh)
+
+    # Shards never share a merchant, so patterns can be concatenated as-is
+    patterns = []
+    for key in keys:
+        result = cached.get(key) or fresh.get(key)
+        if result is None:
+            continue
+        patterns.extend(
+            p for p in result.get("recurring_patterns", []) if p.get("confidence", 0) > 0.5
         )
-
-        patterns = result.get("recurring_patterns", [])
-        return [p for p in patterns if p.get("confidence", 0) > 0.5]
-
-    except Exception as e:
-        logger.warning(f"Recurring detection failed: {e}")
-        return []
+    return patterns
 
 
 def create_recurring_group_from_detection(
@@ -86,7 +148,7 @@ def create_recurring_group_from_detection(
     """
     # Create the group
     group = RecurringGroup(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         name=detection["suggested_name"],
         merchant_pattern=detection["merchant_pattern"],
         expected_amount=Decimal(str(abs(detection["average_amount"]))),
@@ -99,17 +161,16 @@ def create_recurring_group_from_detection(
     # Link transactions to this group
     transaction_ids = detection.get("transaction_ids", [])
     if transaction_ids:
-        db.query(Transaction).filter(Transaction.id.in_(transaction_ids)).update(
-            {Transaction.recurring_group_id: group.id, Transaction.is_recurring: True},
-            synchronize_session=False,
-        )
-
-        # Set last_seen_date from most recent transaction
-        most_recent = (
-            db.query(func.max(Transaction.date))
-            .filter(Transaction.id.in_(transaction_ids))
-            .scalar()
-        )
+        # RETURNING the linked dates gives last_seen_date without a second query
+        linked_dates = db.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(transaction_ids))
+            .values(recurring_group_id=group.id, is_recurring=True)
+            .returning(Transaction.date),
+            execution_options={"synchronize_session": False},
+        ).scalars().all()
+
+        most_recent = max(linked_dates, default=None)
         if most_recent:
             group.last_seen_date = most_recent
             group.next_expected_date = calculate_next_expected(
@@ -117,45 +178,43 @@ def create_recurring_group_from_detection(
             )
 
     db.commit()
-    db.refresh(group)
     return group
 
 
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _add_months(d: date, months: int) -> date:
+    """Add calendar months, clamping the day to the target month's length."""
+    years, month_index = divmod(d.month - 1 + months, 12)
+    year = d.year + years
+    last_day = _DAYS_IN_MONTH[month_index]
+    if month_index == 1 and (year % 4 == 0 and year % 100 != 0 or year % 400 == 0):
+        last_day = 29
+    return date(year, month_index + 1, min(d.day, last_day))
+
+
+_DAY_DELTAS = {
+    Frequency.weekly: timedelta(days=7),
+    Frequency.biweekly: timedelta(days=14),
+}
+_MONTH_DELTAS = {
+    Frequency.monthly: 1,
+    Frequency.quarterly: 3,
+    Frequency.yearly: 12,
+}
+
+
+@lru_cache(maxsize=4096)
 def calculate_next_expected(last_date: date, frequency: Frequency) -> date:
     """Calculate the next expected date based on frequency."""
-    if frequency == Frequency.weekly:
-        return last_date + timedelta(days=7)
-    elif frequency == Frequency.biweekly:
-        return last_date + timedelta(days=14)
-    elif frequency == Frequency.monthly:
-        # Add roughly one month
-        if last_date.month == 12:
-            return date(last_date.year + 1, 1, last_date.day)
-        else:
-            try:
-                return date(last_date.year, last_date.month + 1, last_date.day)
-            except ValueError:
-                # Handle months with fewer days
-                return date(last_date.year, last_date.month + 1, 28)
-    elif frequency == Frequency.quarterly:
-        # Add 3 months
-        new_month = last_date.month + 3
-        new_year = last_date.year
-        if new_month > 12:
-            new_month -= 12
-            new_year += 1
-        try:
-            return date(new_year, new_month, last_date.day)
-        except ValueError:
-            return date(new_year, new_month, 28)
-    elif frequency == Frequency.yearly:
-        try:
-            return date(last_date.year + 1, last_date.month, last_date.day)
-        except ValueError:
-            # Handle leap day (Feb 29) in non-leap years
-            return date(last_date.year + 1, last_date.month, 28)
-    else:
-        return last_date + timedelta(days=30)
+    delta = _DAY_DELTAS.get(frequency)
+    if delta is not None:
+        return last_date + delta
+    months = _MONTH_DELTAS.get(frequency)
+    if months is not None:
+        return _add_months(last_date, months)
+    return last_date + timedelta(days=30)
 
 
 def get_recurring_groups(
@@ -172,8 +231,12 @@ def get_recurring_groups(
 
 def get_group_transaction_count(db: Session, group_id: str) -> int:
     """Get count of transactions in a recurring group."""
+    # count(*) is answered from ix_txn_group_date without touching table rows
     return (
-        db.query(Transaction).filter(Transaction.recurring_group_id == group_id).count()
+        db.query(func.count())
+        .select_from(Transaction)
+        .filter(Transaction.recurring_group_id == group_id)
+        .scalar()
     )
 
 
@@ -188,10 +251,6 @@ def mark_transaction_recurring(
     """
     Mark a transaction as recurring, either linking to existing group or creating new.
     """
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
-    if not transaction:
-        raise ValueError(f"Transaction {transaction_id} not found")
-
     if recurring_group_id:
         # Link to existing group
         group = (
@@ -201,7 +260,23 @@ def mark_transaction_recurring(
         )
         if not group:
             raise ValueError(f"Recurring group {recurring_group_id} not found")
+
+        # RETURNING the date links the transaction without loading it first
+        txn_date = db.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction_id)
+            .values(recurring_group_id=group.id, is_recurring=True)
+            .returning(Transaction.date)
+        ).scalar_one_or_none()
+        if txn_date is None:
+            raise ValueError(f"Transaction {transaction_id} not found")
     elif create_new:
+        transaction = (
+            db.query(Transaction).filter(Transaction.id == transaction_id).first()
+        )
+        if not transaction:
+            raise ValueError(f"Transaction {transaction_id} not found")
+
         # Create new group
         if not new_name:
             new_name = transaction.clean_merchant or transaction.raw_description
@@ -209,7 +284,7 @@ def mark_transaction_recurring(
             new_frequency = Frequency.monthly
 
         group = RecurringGroup(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             name=new_name,
             merchant_pattern=transaction.clean_merchant or transaction.raw_description,
             expected_amount=abs(transaction.amount),
@@ -220,22 +295,20 @@ def mark_transaction_recurring(
             next_expected_date=calculate_next_expected(transaction.date, new_frequency),
         )
         db.add(group)
+
+        # Link transaction
+        transaction.recurring_group_id = group.id
+        transaction.is_recurring = True
+        txn_date = transaction.date
     else:
         raise ValueError("Must provide recurring_group_id or set create_new=True")
 
-    # Link transaction
-    transaction.recurring_group_id = group.id
-    transaction.is_recurring = True
-
     # Update group's last_seen_date if this transaction is more recent
-    if group.last_seen_date is None or transaction.date > group.last_seen_date:
-        group.last_seen_date = transaction.date
-        group.next_expected_date = calculate_next_expected(
-            transaction.date, group.frequency
-        )
+    if group.last_seen_date is None or txn_date > group.last_seen_date:
+        group.last_seen_date = txn_date
+        group.next_expected_date = calculate_next_expected(txn_date, group.frequency)
 
     db.commit()
-    db.refresh(group)
     return group
 
 
@@ -3,16 +3,41 @@
 import re
 import random
 import logging
-from datetime import date, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, Integer
+from sqlalchemy import func, insert, Integer
 
 from app.models.token_map import TokenMap, TokenType, DateShift
 from app.models.privacy_settings import get_or_create_privacy_settings
 
 logger = logging.getLogger(__name__)
 
+TOKEN_RE = re.compile(r"(MERCHANT_\d{4}|ACCOUNT_\d{3}|PERSON_\d{3})")
+
+# IN (...) lookups are chunked to stay under SQLite's bound-parameter limit
+TOKEN_LOOKUP_BATCH_SIZE = 500
+
+# Committed merchant tokens shared by every service instance in the process.
+# token_map rows are never updated or deleted, so entries cannot go stale.
+MERCHANT_CACHE_MAX_SIZE = 10_000
+_merchant_cache: Dict[str, Tuple[str, str]] = {}
+# The installation's date shift; written once and never changed
+_date_shift: Optional[int] = None
+
+
+def invalidate_cache():
+    """Invalidate the shared merchant token and date shift caches."""
+    global _date_shift
+    _merchant_cache.clear()
+    _date_shift = None
+
+
+def _chunks(values: List[str]) -> Iterator[List[str]]:
+    """Split an IN (...) lookup list into TOKEN_LOOKUP_BATCH_SIZE pieces."""
+    for start in range(0, len(values), TOKEN_LOOKUP_BATCH_SIZE):
+        yield values[start:start + TOKEN_LOOKUP_BATCH_SIZE]
+
 
 class TokenizationService:
     """
@@ -20,6 +45,9 @@ class TokenizationService:
 
     Tokens are deterministic and persistent - the same input always produces
     the same token across sessions.
+
+    New tokens are flushed, not committed; use the service as a context
+    manager (or call commit()) so they are persisted in one transaction.
     """
 
     PERSON_PATTERNS = [
@@ -29,35 +57,70 @@ class TokenizationService:
         (r"CASH\s+APP\s+\*([A-Z][A-Z\s]+)", "CASH APP"),
     ]
 
+    # All person patterns in one pass; alternative pN wraps PERSON_PATTERNS[N]
+    _PERSON_RE = re.compile(
+        "|".join(
+            f"(?P<p{i}>{pattern})" for i, (pattern, _) in enumerate(PERSON_PATTERNS)
+        ),
+        re.IGNORECASE,
+    )
+
+    # Every person pattern starts with one of these words; most descriptions have none
+    _PERSON_KEYWORDS = tuple(service.split()[0] for _, service in PERSON_PATTERNS)
+
     def __init__(self, db: Session):
         self.db = db
-        self._cache: Dict[Tuple[TokenType, str], str] = {}
+        # token_type -> normalized value -> token
+        self._cache: Dict[TokenType, Dict[str, str]] = {tt: {} for tt in TokenType}
         self._reverse_cache: Dict[str, str] = {}
-        self._load_caches()
+        # Highest token number per type, synced from the DB on first use
+        self._counters: Dict[TokenType, int] = {}
         self._date_shift: Optional[int] = None
 
-    def _load_caches(self):
-        """Load existing token mappings into memory."""
-        tokens = self.db.query(TokenMap).all()
-        for t in tokens:
-            key = (t.token_type, t.normalized_value)
-            self._cache[key] = t.token
-            self._reverse_cache[t.token] = t.original_value
+    def __enter__(self) -> "TokenizationService":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+
+    def commit(self) -> None:
+        """Persist every token created so far."""
+        self.db.commit()
+        # Only committed tokens are shared with other instances
+        if len(_merchant_cache) >= MERCHANT_CACHE_MAX_SIZE:
+            _merchant_cache.clear()
+        for normalized, token in self._cache[TokenType.merchant].items():
+            original = self._reverse_cache.get(token)
+            if original is not None:
+                _merchant_cache[normalized] = (token, original)
+
+    def _use_shared_merchant(self, normalized: str) -> Optional[str]:
+        """Copy a committed merchant token from the shared cache, if present."""
+        entry = _merchant_cache.get(normalized)
+        if entry is None:
+            return None
+        token, original = entry
+        self._cache[TokenType.merchant][normalized] = token
+        self._reverse_cache[token] = original
+        return token
 
     def _get_date_shift(self) -> int:
         """Get or create the date shift value."""
+        global _date_shift
         if self._date_shift is not None:
             return self._date_shift
+        if _date_shift is not None:
+            self._date_shift = _date_shift
+            return self._date_shift
 
-        shift_record = self.db.query(DateShift).first()
-        if shift_record:
-            self._date_shift = shift_record.shift_days
-        else:
-            self._date_shift = random.randint(500, 1500)
-            shift_record = DateShift(id=1, shift_days=self._date_shift)
-            self.db.add(shift_record)
+        shift_days = self.db.query(DateShift.shift_days).limit(1).scalar()
+        if shift_days is None:
+            shift_days = random.randint(500, 1500)
+            self.db.add(DateShift(id=1, shift_days=shift_days))
             self.db.commit()
 
+        self._date_shift = _date_shift = shift_days
         return self._date_shift
 
     def _normalize(self, value: str) -> str:
@@ -71,19 +134,37 @@ class TokenizationService:
         TokenType.person: 8,      # "PERSON_" is 7 chars, number starts at 8
     }
 
-    def _get_next_token_number(self, token_type: TokenType) -> int:
+    def _get_next_token_number(self, token_type: TokenType, count: int = 1) -> int:
         """
-        Get the next available token number for a type.
-        Uses max() for atomicity instead of count() to avoid race conditions.
+        Reserve `count` consecutive token numbers for a type and return the first.
+        Served from the in-memory counter, which _sync_counter seeds on first
+        use and corrects after a collision with another writer.
         """
+        if token_type not in self._counters:
+            self._sync_counter(token_type)
+        start = self._counters[token_type] + 1
+        self._counters[token_type] += count
+        return start
+
+    def _sync_counter(self, token_type: TokenType) -> None:
+        """Reload the counter from the database using max()."""
         substr_start = self._PREFIX_LENGTHS.get(token_type, 10)
         max_num = (
             self.db.query(func.max(func.cast(func.substr(TokenMap.token, substr_start), Integer)))
             .filter(TokenMap.token_type == token_type)
             .scalar()
         )
+        self._counters[token_type] = max_num or 0
 
-        return (max_num or 0) + 1
+    _TOKEN_FORMATS = {
+        TokenType.merchant: "MERCHANT_{:04d}",
+        TokenType.account: "ACCOUNT_{:03d}",
+        TokenType.person: "PERSON_{:03d}",
+    }
+
+    @classmethod
+    def _format_token(cls, token_type: TokenType, token_num: int) -> str:
+        return cls._TOKEN_FORMATS[token_type].format(token_num)
 
     def _create_token_with_retry(
         self,
@@ -101,13 +182,7 @@ class TokenizationService:
         max_retries = 3
         for attempt in range(max_retries):
             token_num = self._get_next_token_number(token_type)
-
-            if token_type == TokenType.merchant:
-                token = f"MERCHANT_{token_num:04d}"
-            elif token_type == TokenType.account:
-                token = f"ACCOUNT_{token_num:03d}"
-            else:
-                token = f"PERSON_{token_num:03d}"
+            token = self._format_token(token_type, token_num)
 
             token_map = TokenMap(
                 token_type=token_type,
@@ -116,13 +191,14 @@ class TokenizationService:
                 token=token,
                 metadata_=metadata,
             )
-            self.db.add(token_map)
 
             try:
-                self.db.commit()
+                # Savepoint so a collision only discards this row
+                with self.db.begin_nested():
+                    self.db.add(token_map)
                 return token
             except IntegrityError:
-                self.db.rollback()
+                self._sync_counter(token_type)
                 logger.warning(
                     f"Token collision on {token}, retrying (attempt {attempt + 1})"
                 )
@@ -132,6 +208,82 @@ class TokenizationService:
             f"Failed to create unique token after {max_retries} attempts"
         )
 
+    def tokenize_many(
+        self,
+        values: List[str],
+        token_type: TokenType,
+        metadata_list: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> List[str]:
+        """
+        Tokenize many values of one type in a single round trip.
+
+        Cache misses are looked up with one IN query; values that are still
+        unknown get consecutive numbers and are inserted with one flush.
+        Returns tokens in the same order as `values`.
+        """
+        from sqlalchemy.exc import IntegrityError
+
+        normalized_values = [self._normalize(v) for v in values]
+        cache = self._cache[token_type]
+
+        missing: Dict[str, Tuple[str, Optional[Dict[str, Any]]]] = {}
+        for i, (value, normalized) in enumerate(zip(values, normalized_values)):
+            if normalized in cache or normalized in missing:
+                continue
+            if token_type == TokenType.merchant and self._use_shared_merchant(normalized):
+                continue
+            metadata = metadata_list[i] if metadata_list else None
+            missing[normalized] = (value, metadata)
+
+        for chunk in _chunks(list(missing)):
+            existing = (
+                self.db.query(
+                    TokenMap.normalized_value, TokenMap.token, TokenMap.original_value
+                )
+                .filter(
+                    TokenMap.token_type == token_type,
+                    TokenMap.normalized_value.in_(chunk),
+                )
+                .all()
+            )
+            for normalized, token, original in existing:
+                cache[normalized] = token
+                self._reverse_cache[token] = original
+                del missing[normalized]
+
+        if missing:
+            start = self._get_next_token_number(token_type, len(missing))
+            rows = [
+                {
+                    "token_type": token_type,
+                    "original_value": value,
+                    "normalized_value": normalized,
+                    "token": self._format_token(token_type, start + i),
+                    "metadata_": metadata,
+                }
+                for i, (normalized, (value, metadata)) in enumerate(missing.items())
+            ]
+            try:
+                # One executemany INSERT; no TokenMap instances are built
+                with self.db.begin_nested():
+                    self.db.execute(insert(TokenMap), rows)
+            except IntegrityError:
+                # Another writer took some of these numbers; fall back to per-value retry
+                self._sync_counter(token_type)
+                logger.warning("Token collision in batch insert, retrying individually")
+                for normalized, (value, metadata) in missing.items():
+                    token = self._create_token_with_retry(
+                        token_type, value, normalized, metadata
+                    )
+                    cache[normalized] = token
+                    self._reverse_cache[token] = value
+            else:
+                for row in rows:
+                    cache[row["normalized_value"]] = row["token"]
+                    self._reverse_cache[row["token"]] = row["original_value"]
+
+        return [cache[n] for n in normalized_values]
+
     def tokenize_merchant(
         self,
         merchant: str,
@@ -144,10 +296,11 @@ class TokenizationService:
         Returns: Token like "MERCHANT_042"
         """
         normalized = self._normalize(merchant)
-        cache_key = (TokenType.merchant, normalized)
+        cache = self._cache[TokenType.merchant]
 
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        token = cache.get(normalized) or self._use_shared_merchant(normalized)
+        if token is not None:
+            return token
 
         existing = (
             self.db.query(TokenMap)
@@ -159,7 +312,7 @@ class TokenizationService:
         )
 
         if existing:
-            self._cache[cache_key] = existing.token
+            cache[normalized] = existing.token
             self._reverse_cache[existing.token] = existing.original_value
             return existing.token
 
@@ -173,7 +326,7 @@ class TokenizationService:
             TokenType.merchant, merchant, normalized, metadata if metadata else None
         )
 
-        self._cache[cache_key] = token
+        cache[normalized] = token
         self._reverse_cache[token] = merchant
 
         return token
@@ -183,10 +336,11 @@ class TokenizationService:
     ) -> str:
         """Tokenize an account identifier."""
         normalized = self._normalize(account_name)
-        cache_key = (TokenType.account, normalized)
+        cache = self._cache[TokenType.account]
 
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        token = cache.get(normalized)
+        if token is not None:
+            return token
 
         existing = (
             self.db.query(TokenMap)
@@ -198,7 +352,7 @@ class TokenizationService:
         )
 
         if existing:
-            self._cache[cache_key] = existing.token
+            cache[normalized] = existing.token
             self._reverse_cache[existing.token] = existing.original_value
             return existing.token
 
@@ -208,7 +362,7 @@ class TokenizationService:
             TokenType.account, account_name, normalized, metadata
         )
 
-        self._cache[cache_key] = token
+        cache[normalized] = token
         self._reverse_cache[token] = account_name
 
         return token
@@ -219,26 +373,27 @@ class TokenizationService:
 
         Example: "VENMO JOHN SMITH" -> "VENMO PERSON_001"
         """
-        result = description
-
-        for pattern, service in self.PERSON_PATTERNS:
-            match = re.search(pattern, description.upper())
-            if match:
-                person_name = match.group(1).strip()
-                person_token = self._tokenize_person(person_name)
-                result = re.sub(
-                    pattern, f"{service} {person_token}", result, flags=re.IGNORECASE
-                )
-
-        return result
+        upper = description.upper()
+        if not any(keyword in upper for keyword in self._PERSON_KEYWORDS):
+            return description
+        return self._PERSON_RE.sub(self._replace_person, description)
+
+    def _replace_person(self, match: re.Match) -> str:
+        """Replace one person-pattern match with "<SERVICE> <PERSON token>"."""
+        group = match.lastgroup
+        service = self.PERSON_PATTERNS[int(group[1:])][1]
+        # Each pattern's name capture is the group right after its wrapper
+        person_name = match.group(match.re.groupindex[group] + 1).strip().upper()
+        return f"{service} {self._tokenize_person(person_name)}"
 
     def _tokenize_person(self, person_name: str) -> str:
         """Tokenize a person's name."""
         normalized = self._normalize(person_name)
-        cache_key = (TokenType.person, normalized)
+        cache = self._cache[TokenType.person]
 
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        token = cache.get(normalized)
+        if token is not None:
+            return token
 
         existing = (
             self.db.query(TokenMap)
@@ -250,7 +405,7 @@ class TokenizationService:
         )
 
         if existing:
-            self._cache[cache_key] = existing.token
+            cache[normalized] = existing.token
             self._reverse_cache[existing.token] = existing.original_value
             return existing.token
 
@@ -258,20 +413,19 @@ class TokenizationService:
             TokenType.person, person_name, normalized, None
         )
 
-        self._cache[cache_key] = token
+        cache[normalized] = token
         self._reverse_cache[token] = person_name
 
         return token
 
     def shift_date(self, original_date: date) -> date:
         """Shift a date by the installation's random offset."""
-        shift = self._get_date_shift()
-        return original_date + timedelta(days=shift)
+        # Ordinal arithmetic skips building a timedelta per call
+        return date.fromordinal(original_date.toordinal() + self._get_date_shift())
 
     def unshift_date(self, shifted_date: date) -> date:
         """Reverse date shift for display."""
-        shift = self._get_date_shift()
-        return shifted_date - timedelta(days=shift)
+        return date.fromordinal(shifted_date.toordinal() - self._get_date_shift())
 
     def detokenize(self, text: str) -> str:
         """
@@ -279,16 +433,26 @@ class TokenizationService:
 
         Used for displaying AI responses to users.
         """
-        result = text
-
-        token_pattern = r"(MERCHANT_\d{4}|ACCOUNT_\d{3}|PERSON_\d{3})"
+        reverse = self.get_originals(TOKEN_RE.findall(text))
+        return TOKEN_RE.sub(lambda m: reverse.get(m.group(1), m.group(0)), text)
 
-        for match in re.finditer(token_pattern, text):
-            token = match.group(1)
-            if token in self._reverse_cache:
-                result = result.replace(token, self._reverse_cache[token])
+    def get_originals(self, tokens: List[str]) -> Dict[str, str]:
+        """
+        Map tokens to their original values, skipping unknown tokens.
 
-        return result
+        Tokens not seen by this instance are fetched with chunked IN queries.
+        """
+        reverse = self._reverse_cache
+        missing = list({t for t in tokens if t not in reverse})
+        for chunk in _chunks(missing):
+            rows = (
+                self.db.query(TokenMap.token, TokenMap.original_value)
+                .filter(TokenMap.token.in_(chunk))
+                .all()
+            )
+            for token, original in rows:
+                reverse[token] = original
+        return {t: reverse[t] for t in tokens if t in reverse}
 
     def tokenize_transaction_for_ai(
         self, transaction: Dict[str, Any], include_category: bool = True
@@ -299,42 +463,78 @@ class TokenizationService:
         Input: {"merchant": "Whole Foods", "amount": -187.34, "date": "2024-01-15", ...}
         Output: {"merchant": "MERCHANT_042 [Groceries]", "amount": -187.34, "date": "2026-08-09", ...}
         """
-        result = dict(transaction)
+        return self.tokenize_transactions_for_ai([transaction], include_category)[0]
 
-        if "merchant" in result or "clean_merchant" in result:
-            merchant = result.get("clean_merchant") or result.get("merchant", "")
-            category = result.get("category_name") if include_category else None
-            token = self.tokenize_merchant(merchant, category)
+    def tokenize_transactions_for_ai(
+        self, transactions: List[Dict[str, Any]], include_category: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Tokenize many transaction dicts for sending to AI.
 
-            if include_category and category:
-                result["merchant"] = f"{token} [{category}]"
-            else:
-                result["merchant"] = token
+        Merchants and accounts are resolved with one tokenize_many call per
+        type up front, so the per-row pass only does cache lookups.
+        """
+        merchants: List[str] = []
+        merchant_metadata: List[Optional[Dict[str, Any]]] = []
+        accounts: List[str] = []
+        account_metadata: List[Optional[Dict[str, Any]]] = []
+        for t in transactions:
+            if "merchant" in t or "clean_merchant" in t:
+                merchants.append(t.get("clean_merchant") or t.get("merchant", ""))
+                category = t.get("category_name") if include_category else None
+                merchant_metadata.append({"category": category} if category else None)
+            if "account_name" in t:
+                accounts.append(t["account_name"])
+                account_type = t.get("account_type")
+                account_metadata.append(
+                    {"account_type": account_type} if account_type else None
+                )
 
-            result.pop("clean_merchant", None)
-            result.pop("raw_description", None)
+        merchant_tokens = iter(
+            self.tokenize_many(merchants, TokenType.merchant, merchant_metadata)
+        )
+        account_tokens = iter(
+            self.tokenize_many(accounts, TokenType.account, account_metadata)
+        )
+        shift = timedelta(days=self._get_date_shift())
+        # Statements repeat the same few hundred dates; shift and format each once
+        shifted_dates: Dict[Any, str] = {}
 
-        if "description" in result:
-            result["description"] = self.tokenize_description(result["description"])
+        results = []
+        for transaction in transactions:
+            result = dict(transaction)
 
-        if "date" in result:
-            if isinstance(result["date"], str):
-                from datetime import datetime
+            if "merchant" in result or "clean_merchant" in result:
+                token = next(merchant_tokens)
+                category = result.get("category_name") if include_category else None
 
-                d = datetime.fromisoformat(result["date"]).date()
-            else:
-                d = result["date"]
-            result["date"] = self.shift_date(d).isoformat()
+                if include_category and category:
+                    result["merchant"] = f"{token} [{category}]"
+                else:
+                    result["merchant"] = token
 
-        if "account_name" in result:
-            account_type = result.get("account_type")
-            result["account"] = self.tokenize_account(
-                result["account_name"], account_type
-            )
-            result.pop("account_name", None)
-            result.pop("account_type", None)
+                result.pop("clean_merchant", None)
+                result.pop("raw_description", None)
+
+            if "description" in result:
+                result["description"] = self.tokenize_description(result["description"])
 
-        return result
+            if "date" in result:
+                raw = result["date"]
+                shifted = shifted_dates.get(raw)
+                if shifted is None:
+                    d = datetime.fromisoformat(raw).date() if isinstance(raw, str) else raw
+                    shifted = shifted_dates[raw] = (d + shift).isoformat()
+                result["date"] = shifted
+
+            if "account_name" in result:
+                result["account"] = next(account_tokens)
+                result.pop("account_name", None)
+                result.pop("account_type", None)
+
+            results.append(result)
+
+        return results
 
     def get_unknown_merchants(self, merchants: List[str]) -> List[str]:
         """
@@ -342,36 +542,47 @@ class TokenizationService:
 
         Used for bulk categorization - only send new merchants to AI.
         """
-        unknown = []
-        for merchant in merchants:
-            normalized = self._normalize(merchant)
-            cache_key = (TokenType.merchant, normalized)
-            if cache_key not in self._cache:
-                existing = (
-                    self.db.query(TokenMap)
-                    .filter(
-                        TokenMap.token_type == TokenType.merchant,
-                        TokenMap.normalized_value == normalized,
-                    )
-                    .first()
+        cache = self._cache[TokenType.merchant]
+        normalized = {m: self._normalize(m) for m in merchants}
+        lookup = list(
+            {
+                n for n in normalized.values()
+                if n not in cache and not self._use_shared_merchant(n)
+            }
+        )
+        if not lookup:
+            return []
+
+        for chunk in _chunks(lookup):
+            found = (
+                self.db.query(
+                    TokenMap.normalized_value, TokenMap.token, TokenMap.original_value
                 )
-                if not existing:
-                    unknown.append(merchant)
+                .filter(
+                    TokenMap.token_type == TokenType.merchant,
+                    TokenMap.normalized_value.in_(chunk),
+                )
+                .all()
+            )
+            for value, token, original in found:
+                cache[value] = token
+                self._reverse_cache[token] = original
 
-        return unknown
+        return [m for m in merchants if normalized[m] not in cache]
 
     def get_token_stats(self) -> Dict[str, int]:
         """Get counts of each token type."""
-        stats = {}
-        for token_type in TokenType:
-            count = (
-                self.db.query(TokenMap)
-                .filter(TokenMap.token_type == token_type)
-                .count()
-            )
+        stats = {token_type.value: 0 for token_type in TokenType}
+        counts = (
+            self.db.query(TokenMap.token_type, func.count(TokenMap.id))
+            .group_by(TokenMap.token_type)
+            .all()
+        )
+        for token_type, count in counts:
             stats[token_type.value] = count
 
-        shift = self.db.query(DateShift).first()
-        stats["date_shift_days"] = shift.shift_days if shift else 0
+        stats["date_shift_days"] = (
+            self.db.query(DateShift.shift_days).limit(1).scalar() or 0
+        )
 
         return stats
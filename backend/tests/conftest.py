@@ -1,14 +1,18 @@
 """Shared test fixtures."""
 
 import pytest
+from contextlib import contextmanager
+from contextvars import ContextVar
 from sqlalchemy import create_engine, inspect, event
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import Session
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
 from datetime import date, timedelta
 from decimal import Decimal
-import uuid
+import itertools
+import warnings
 
+from app.config import settings
 from app.database import Base
 from app.dependencies import get_db
 from app.main import app
@@ -18,52 +22,176 @@ from app.models.transaction import Transaction
 from app.models.recurring import RecurringGroup, Frequency
 from app.models.alert import Alert, AlertType, Severity, AlertSettings
 from app.models.budget import Budget, BudgetPeriod
+from app.services import tokenization_service
 
 
-@pytest.fixture(scope="function")
-def db_session():
-    """Create a fresh database for each test using in-memory SQLite."""
+_id_seq = itertools.count()
+
+
+def make_id() -> str:
+    """Unique id for test rows; tests only need uniqueness within a run."""
+    return f"tid-{next(_id_seq):08x}"
+
+
+@contextmanager
+def assert_max_queries(session: Session, n: int):
+    """Fail if the block runs more than n SQL statements on the session's connection."""
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    connection = session.connection()
+    event.listen(connection, "before_cursor_execute", _count)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", _count)
+    assert len(statements) <= n, (
+        f"expected at most {n} queries, ran {len(statements)}:\n" + "\n".join(statements)
+    )
+
+
+def _set_test_pragmas(dbapi_connection, connection_record):
+    # Throwaway database: no durability needed, keep everything in memory
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA locking_mode=EXCLUSIVE")
+    cursor.close()
+    # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs nest properly under pysqlite
+    dbapi_connection.isolation_level = None
+
+
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+# Statements a test may run, setup included, unless marked query_budget(n)
+DEFAULT_QUERY_BUDGET = 100
+
+
+class QueryBudgetWarning(UserWarning):
+    """A test ran more SQL statements than its query budget."""
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request):
+    """Count statements for tests that use the database and warn past the budget."""
+    if "db_session" not in request.fixturenames:
+        yield
+        return
+
+    engine = request.getfixturevalue("engine")
+    request.node.query_count = 0
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        request.node.query_count += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    yield
+    event.remove(engine, "before_cursor_execute", _count)
+
+    marker = request.node.get_closest_marker("query_budget")
+    budget = marker.args[0] if marker else DEFAULT_QUERY_BUDGET
+    if request.node.query_count > budget:
+        warnings.warn(
+            f"{request.node.nodeid} ran {request.node.query_count} queries "
+            f"(budget {budget})",
+            QueryBudgetWarning,
+        )
+
+
+@pytest.fixture(autouse=True)
+def _reset_token_cache():
+    """Tokens committed inside a rolled-back test must not leak into the next."""
+    yield
+    tokenization_service.invalidate_cache()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def import_dirs(tmp_path_factory):
+    """Keep uploaded test files out of the working tree."""
+    root = tmp_path_factory.mktemp("imports")
+    patcher = pytest.MonkeyPatch()
+    for name in ("inbox", "processed", "failed"):
+        patcher.setattr(settings, f"import_{name}_path", str(root / name))
+    yield root
+    patcher.undo()
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """One in-memory database and schema for the whole test run."""
     # Use StaticPool to ensure all connections use the same in-memory database
     engine = create_engine(
         "sqlite:///:memory:",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
-
-    # Create all tables
+    event.listen(engine, "connect", _set_test_pragmas)
+    event.listen(engine, "begin", _emit_begin)
     Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
 
-    # Create session
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    session = TestingSessionLocal()
+
+@pytest.fixture(scope="function")
+def db_session(engine):
+    """
+    Session joined to an outer transaction that is rolled back after the test.
+
+    Commits and rollbacks inside the test only touch SAVEPOINTs, so every
+    test starts from the empty schema without re-running DDL.
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(
+        bind=connection,
+        autoflush=False,
+        join_transaction_mode="create_savepoint",
+    )
 
     try:
         yield session
     finally:
         session.close()
-        Base.metadata.drop_all(bind=engine)
-        engine.dispose()
+        transaction.rollback()
+        connection.close()
 
 
-@pytest.fixture(scope="function")
-def client(db_session):
-    """Create a test client with database override."""
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
-
-    app.dependency_overrides[get_db] = override_get_db
+_test_db: ContextVar[Session] = ContextVar("_test_db")
+
+
+def _get_test_db():
+    yield _test_db.get()
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    """One TestClient, and one app startup, for the whole run."""
+    app.dependency_overrides[get_db] = _get_test_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+def client(app_client, db_session):
+    """Shared test client serving requests from this test's session."""
+    token = _test_db.set(db_session)
+    yield app_client
+    _test_db.reset(token)
+
+
+# Sample rows stay function-scoped: they are inserted inside each test's
+# rolled-back transaction, and tests such as test_list_accounts_empty rely on
+# tables starting empty.
 @pytest.fixture
 def sample_account(db_session):
     """Create a sample account."""
-    account = Account(id=str(uuid.uuid4()), name="Test Checking")
+    account = Account(id=make_id(), name="Test Checking")
     account.account_type = AccountType.checking
     account.is_active = True
 
@@ -77,7 +205,7 @@ def sample_account(db_session):
 def sample_category(db_session):
     """Create a sample category."""
     category = Category(
-        id=str(uuid.uuid4()),
+        id=make_id(),
         name="Groceries",
         color="#22c55e",
         icon="shopping-cart",
@@ -93,7 +221,7 @@ def sample_category(db_session):
 def sample_transaction(db_session, sample_account, sample_category):
     """Create a sample transaction."""
     txn = Transaction(
-        id=str(uuid.uuid4()),
+        id=make_id(),
         hash="abc123",
         date=date(2024, 1, 15),
         amount=Decimal("-50.00"),
@@ -114,7 +242,7 @@ def sample_transaction(db_session, sample_account, sample_category):
 def sample_recurring_group(db_session, sample_category):
     """Create a sample recurring group."""
     group = RecurringGroup(
-        id=str(uuid.uuid4()),
+        id=make_id(),
         name="Netflix",
         merchant_pattern="Netflix",
         expected_amount=Decimal("15.99"),
@@ -135,7 +263,7 @@ def sample_recurring_group(db_session, sample_category):
 def alert_settings(db_session):
     """Create default alert settings."""
     settings = AlertSettings(
-        id=str(uuid.uuid4()),  # String UUID as expected by model
+        id=make_id(),
         large_purchase_multiplier=Decimal("3.0"),
         unusual_merchant_threshold=Decimal("200.0"),
         alerts_enabled=True
@@ -150,7 +278,7 @@ def alert_settings(db_session):
 def sample_budget(db_session, sample_category):
     """Create a sample budget."""
     budget = Budget(
-        id=str(uuid.uuid4()),
+        id=make_id(),
         category_id=sample_category.id,
         amount=Decimal("500.00"),
         period=BudgetPeriod.weekly,
@@ -1,15 +1,18 @@
 """Tests for alerts service threshold logic."""
 
 import pytest
-from datetime import date, timedelta
+from freezegun import freeze_time
+from datetime import date
 from decimal import Decimal
-import uuid
+
+from sqlalchemy import insert
 
 from app.services.alerts_service import (
     get_or_create_settings,
     get_category_average,
     is_first_time_merchant,
     check_price_increase,
+    analyze_transaction_for_alerts_with_settings,
     get_alerts,
     get_unread_count,
     mark_all_read,
@@ -18,6 +21,10 @@ from app.services.alerts_service import (
 from app.models.transaction import Transaction
 from app.models.recurring import RecurringGroup, Frequency
 from app.models.alert import Alert, AlertType, Severity
+from tests.conftest import assert_max_queries, make_id
+
+_AVERAGE_AMOUNTS = (Decimal("-50.00"), Decimal("-100.00"), Decimal("-150.00"))
+_AVERAGE_DATES = (date(2024, 5, 31), date(2024, 5, 30), date(2024, 5, 29))
 
 
 class TestAlertSettings:
@@ -37,6 +44,7 @@ class TestAlertSettings:
         assert settings.id == alert_settings.id
 
 
+@freeze_time("2024-06-01")
 class TestCategoryAverage:
     """Test category spending average calculation."""
 
@@ -48,18 +56,21 @@ class TestCategoryAverage:
     def test_calculates_average(self, db_session, sample_category, sample_account):
         """Should calculate average of expenses."""
         # Add some transactions with recent dates
-        amounts = [Decimal("-50.00"), Decimal("-100.00"), Decimal("-150.00")]
-        for i, amount in enumerate(amounts):
-            txn = Transaction(
-                id=str(uuid.uuid4()),
-                hash=f"hash-cat-{i}",
-                date=date.today() - timedelta(days=i + 1),  # Recent dates
-                amount=amount,
-                raw_description=f"Test {i}",
-                category_id=sample_category.id,
-                account_id=sample_account.id
-            )
-            db_session.add(txn)
+        db_session.execute(
+            insert(Transaction),
+            [
+                {
+                    "id": make_id(),
+                    "hash": f"hash-cat-{i}",
+                    "date": txn_date,
+                    "amount": amount,
+                    "raw_description": f"Test {i}",
+                    "category_id": sample_category.id,
+                    "account_id": sample_account.id,
+                }
+                for i, (amount, txn_date) in enumerate(zip(_AVERAGE_AMOUNTS, _AVERAGE_DATES))
+            ],
+        )
         db_session.commit()
 
         avg = get_category_average(db_session, sample_category.id, months=12)
@@ -69,7 +80,7 @@ class TestCategoryAverage:
         """Should only average negative amounts (expenses)."""
         # Add an income transaction
         txn = Transaction(
-            id=str(uuid.uuid4()),
+            id=make_id(),
             hash="hash-income",
             date=date(2024, 1, 1),
             amount=Decimal("500.00"),  # Positive = income
@@ -143,6 +154,46 @@ class TestPriceIncrease:
         assert result["increase"] == pytest.approx(1.60, rel=0.01)
 
 
+class TestAnalyzeTransaction:
+    """Test single-transaction alert analysis."""
+
+    def _make_txn(self, db_session, account, merchant, amount, category_id=None):
+        txn = Transaction(
+            id=make_id(),
+            hash=f"hash-{make_id()}",
+            date=date.today(),
+            amount=Decimal(amount),
+            raw_description=merchant.upper(),
+            clean_merchant=merchant,
+            category_id=category_id,
+            account_id=account.id
+        )
+        db_session.add(txn)
+        db_session.commit()
+        return txn
+
+    def test_small_new_merchant_no_alert(self, db_session, sample_account, alert_settings):
+        """Small charge at a new merchant stays below the unusual threshold."""
+        txn = self._make_txn(db_session, sample_account, "Corner Cafe", "-4.50")
+        assert analyze_transaction_for_alerts_with_settings(db_session, txn, alert_settings) is None
+
+    def test_large_new_merchant_alert(self, db_session, sample_account, alert_settings):
+        """Charge over the threshold at a new merchant creates an alert."""
+        txn = self._make_txn(db_session, sample_account, "Furniture Barn", "-450.00")
+        alert = analyze_transaction_for_alerts_with_settings(db_session, txn, alert_settings)
+        assert alert is not None
+        assert alert.type == AlertType.unusual_merchant
+
+    def test_price_increase_on_small_charge(
+        self, db_session, sample_account, sample_recurring_group, alert_settings
+    ):
+        """Recurring price increases are flagged regardless of amount."""
+        txn = self._make_txn(db_session, sample_account, "Netflix", "-19.99")
+        alert = analyze_transaction_for_alerts_with_settings(db_session, txn, alert_settings)
+        assert alert is not None
+        assert alert.type == AlertType.price_increase
+
+
 class TestAlertQueries:
     """Test alert query functions."""
 
@@ -154,7 +205,7 @@ class TestAlertQueries:
     def test_get_alerts_filters_dismissed(self, db_session):
         """Should filter out dismissed alerts by default."""
         alert = Alert(
-            id=str(uuid.uuid4()),
+            id=make_id(),
             type=AlertType.large_purchase,
             severity=Severity.warning,
             title="Test",
@@ -170,17 +221,19 @@ class TestAlertQueries:
     def test_get_unread_count(self, db_session):
         """Should count unread, non-dismissed alerts."""
         # Add 2 unread, 1 read
-        for i in range(2):
-            db_session.add(Alert(
-                id=str(uuid.uuid4()),
+        db_session.add_all([
+            Alert(
+                id=make_id(),
                 type=AlertType.large_purchase,
                 severity=Severity.info,
                 title=f"Unread {i}",
                 description="Test",
-                is_read=False
-            ))
+                is_read=False,
+            )
+            for i in range(2)
+        ])
         db_session.add(Alert(
-            id=str(uuid.uuid4()),
+            id=make_id(),
             type=AlertType.large_purchase,
             severity=Severity.info,
             title="Read",
@@ -194,22 +247,25 @@ class TestAlertQueries:
 
     def test_mark_all_read(self, db_session):
         """Should mark all alerts as read."""
-        for i in range(3):
-            db_session.add(Alert(
-                id=str(uuid.uuid4()),
+        db_session.add_all([
+            Alert(
+                id=make_id(),
                 type=AlertType.large_purchase,
                 severity=Severity.info,
                 title=f"Alert {i}",
                 description="Test",
-                is_read=False
-            ))
+                is_read=False,
+            )
+            for i in range(3)
+        ])
         db_session.commit()
 
         updated = mark_all_read(db_session)
-        assert updated == 3
+        assert len(updated) == 3
         assert get_unread_count(db_session) == 0
 
 
+@freeze_time("2024-06-01")
 class TestUpcomingRenewals:
     """Test upcoming renewals query (Phase 6)."""
 
@@ -222,7 +278,7 @@ class TestUpcomingRenewals:
     def test_future_renewal_excluded(self, db_session, sample_recurring_group, sample_account):
         """Should exclude renewals beyond 30 days."""
         # Set next expected date to 60 days in future
-        sample_recurring_group.next_expected_date = date.today() + timedelta(days=60)
+        sample_recurring_group.next_expected_date = date(2024, 7, 31)
         db_session.commit()
 
         result = get_upcoming_renewals(db_session, days=30)
@@ -231,7 +287,7 @@ class TestUpcomingRenewals:
     def test_past_renewal_included(self, db_session, sample_recurring_group, sample_account):
         """Should include renewals within 30 days."""
         # Set next expected date to 7 days in future
-        sample_recurring_group.next_expected_date = date.today() + timedelta(days=7)
+        sample_recurring_group.next_expected_date = date(2024, 6, 8)
         db_session.commit()
 
         result = get_upcoming_renewals(db_session, days=30)
@@ -259,7 +315,7 @@ class TestUpcomingRenewals:
         """Should sum amounts of upcoming renewals."""
         # Add another recurring group with upcoming date
         group2 = RecurringGroup(
-            id=str(uuid.uuid4()),
+            id=make_id(),
             name="Spotify",
             merchant_pattern="Spotify",
             expected_amount=Decimal("10.00"),
@@ -268,10 +324,13 @@ class TestUpcomingRenewals:
             category_id=sample_recurring_group.category_id,
             is_active=True,
             last_seen_date=date(2024, 1, 1),
-            next_expected_date=date.today() + timedelta(days=15)
+            next_expected_date=date(2024, 6, 16)
         )
         db_session.add(group2)
         db_session.commit()
 
-        result = get_upcoming_renewals(db_session, days=30)
-        assert result["total_upcoming_30_days"] == pytest.approx(25.99, rel=0.01)
+        # One query however many groups are due
+        with assert_max_queries(db_session, 1):
+            result = get_upcoming_renewals(db_session, days=30)
+        # Float sum of 15.99 + 10.00 is not exact
+        assert result["total_upcoming_30_days"] == pytest.approx(25.99)
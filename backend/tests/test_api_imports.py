@@ -5,9 +5,12 @@ from datetime import date
 from decimal import Decimal
 import uuid
 import io
+from unittest.mock import patch
 
 from app.models.account import Account, AccountType
 from app.models.import_log import ImportLog, ImportStatus
+from app.schemas.import_file import ImportConfirmRequest
+from app.services.import_service import run_import_job
 
 
 class TestImportUpload:
@@ -56,6 +59,88 @@ class TestImportUpload:
         assert response.status_code in [400, 500]
 
 
+class TestImportConfirm:
+    """Test import confirm endpoint."""
+
+    def test_confirm_not_found(self, client, sample_account):
+        """Should return 404 for unknown import."""
+        response = client.post(
+            "/api/v1/imports/nonexistent-id/confirm",
+            json={
+                "account_id": sample_account.id,
+                "column_mapping": {"date_col": 0, "amount_col": 1, "description_col": 2},
+            },
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.query_budget(57)
+    def test_confirm_runs_in_background(self, client, db_session, sample_account):
+        """Should accept with 202 and finish the import in a background task."""
+        csv_content = b"date,amount,description\n2024-01-15,-50.00,Grocery Store\n2024-01-16,-25.00,Gas"
+        upload = client.post(
+            "/api/v1/imports/upload",
+            files={"file": ("confirm.csv", io.BytesIO(csv_content), "text/csv")},
+        )
+        import_id = upload.json()["import_id"]
+
+        with patch(
+            "app.services.import_service.SessionLocal", lambda: db_session
+        ), patch("app.services.import_service.settings.ai_auto_categorize", False):
+            response = client.post(
+                f"/api/v1/imports/{import_id}/confirm",
+                json={
+                    "account_id": sample_account.id,
+                    "column_mapping": {"date_col": 0, "amount_col": 1, "description_col": 2},
+                    "date_format": "%Y-%m-%d",
+                    "save_format": False,
+                },
+            )
+
+        assert response.status_code == 202
+        assert response.json()["status"] == "processing"
+
+        status = client.get(f"/api/v1/imports/{import_id}/status").json()
+        assert status["status"] == "completed"
+        assert status["transactions_imported"] == 2
+
+    def test_confirm_conflict_while_processing(self, client, db_session, sample_account):
+        """A second confirm for an import already running should return 409."""
+        db_session.add(
+            ImportLog(id="running-id", filename="a.csv", status=ImportStatus.processing)
+        )
+        db_session.commit()
+
+        with patch("app.services.import_service.run_import_job") as job:
+            response = client.post(
+                "/api/v1/imports/running-id/confirm",
+                json={
+                    "account_id": sample_account.id,
+                    "column_mapping": {"date_col": 0, "amount_col": 1, "description_col": 2},
+                },
+            )
+
+        assert response.status_code == 409
+        job.assert_not_called()
+
+    async def test_job_marks_log_failed_when_pending_gone(self, db_session, sample_account):
+        """A job whose upload expired before it ran should leave the log failed."""
+        db_session.add(
+            ImportLog(id="swept-id", filename="a.csv", status=ImportStatus.processing)
+        )
+        db_session.commit()
+
+        request = ImportConfirmRequest(
+            account_id=sample_account.id,
+            column_mapping={"date_col": 0, "amount_col": 1, "description_col": 2},
+        )
+        with patch("app.services.import_service.SessionLocal", lambda: db_session):
+            await run_import_job("swept-id", request)
+
+        import_log = db_session.get(ImportLog, "swept-id")
+        assert import_log.status == ImportStatus.failed
+        assert "not found or expired" in import_log.error_message
+
+
 class TestImportStatus:
     """Test import status endpoint."""
 
@@ -64,6 +64,26 @@ class TestCoachConversations:
         )
         assert len(messages) == 2
 
+    def test_tokens_committed_before_ai_call(self, db_session):
+        """Context tokens should be committed before the AI call starts."""
+        service = CoachService(db_session)
+        calls = []
+        commit = service.tokenizer.commit
+        service.tokenizer.commit = lambda: (calls.append("commit"), commit())
+
+        mock_ai_client = MagicMock()
+        mock_ai_client.complete = AsyncMock(
+            side_effect=lambda **kwargs: calls.append("complete") or "Sure."
+        )
+
+        with patch(
+            "app.services.coach_service.get_ai_client_with_db",
+            return_value=mock_ai_client,
+        ):
+            asyncio.get_event_loop().run_until_complete(service.chat("Hi"))
+
+        assert calls[:2] == ["commit", "complete"]
+
     def test_invalid_conversation_raises_error(self, db_session):
         """Chat with invalid conversation_id should raise error."""
         service = CoachService(db_session)
@@ -6,6 +6,8 @@ import tempfile
 import os
 
 from app.parsers.csv_parser import CSVParser
+from app.parsers.ofx_parser import OFXParser
+from app.services.import_service import get_parser
 
 
 class TestCSVParser:
@@ -33,6 +35,12 @@ class TestCSVParser:
         assert parser.can_parse(Path("test.CSV")) is True
         assert parser.can_parse(Path("test.ofx")) is False
 
+    def test_get_parser_dispatch(self):
+        """Should pick the parser class by suffix, case-insensitively."""
+        assert isinstance(get_parser(Path("test.CSV")), CSVParser)
+        assert isinstance(get_parser(Path("test.qfx")), OFXParser)
+        assert get_parser(Path("test.xlsx")) is None
+
     def test_get_preview_basic(self, parser, temp_csv_file):
         """Should parse basic CSV and return preview."""
         content = "date,amount,description\n2024-01-15,-50.00,Grocery Store\n2024-01-16,-25.00,Gas Station"
@@ -178,3 +186,33 @@ class TestCSVParser:
         assert headers == ["date", "amount", "description"]
 
         os.unlink(file_path)
+
+    def test_count_rows(self, parser, temp_csv_file):
+        """Should count data rows with or without a trailing newline."""
+        without_newline = temp_csv_file("date,amount\n2024-01-15,-50.00\n2024-01-16,-25.00")
+        with_newline = temp_csv_file("date,amount\n2024-01-15,-50.00\n2024-01-16,-25.00\n")
+
+        assert parser.count_rows(without_newline) == 2
+        assert parser.count_rows(with_newline) == 2
+
+        os.unlink(without_newline)
+        os.unlink(with_newline)
+
+    @pytest.mark.parametrize("newline", ["\r", "\r\n"])
+    def test_count_rows_other_line_endings(self, parser, temp_csv_file, newline):
+        """CR-only and CRLF files should count the same as LF files."""
+        content = newline.join(["date,amount", "2024-01-15,-50.00", "2024-01-16,-25.00"])
+        path = temp_csv_file(content + newline)
+
+        assert parser.count_rows(path) == 2
+
+        os.unlink(path)
+
+    def test_count_rows_crlf_split_across_chunks(self, parser, temp_csv_file):
+        """A CRLF straddling the read-chunk boundary should count once."""
+        header = "h" * ((1 << 20) - 1)
+        path = temp_csv_file(header + "\r\n2024-01-15,-50.00\r\n")
+
+        assert parser.count_rows(path) == 1
+
+        os.unlink(path)
@@ -1,138 +1,75 @@
 """Tests for transaction deduplication logic."""
 
+import hashlib
 import pytest
 from datetime import date
 from decimal import Decimal
 
-from app.services.deduplication_service import generate_transaction_hash, is_duplicate
+from app.services.deduplication_service import (
+    generate_transaction_hash,
+    generate_transaction_hashes,
+    get_existing_hashes,
+    get_existing_hashes_for_account,
+    is_duplicate,
+)
 from app.models.transaction import Transaction
+from app.services.import_service import bulk_insert_transactions
 
 
-class TestTransactionHash:
-    """Test hash generation for deduplication."""
-
-    def test_same_inputs_same_hash(self):
-        """Identical inputs should produce identical hashes."""
-        hash1 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON PURCHASE",
-            "account-123"
-        )
-        hash2 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON PURCHASE",
-            "account-123"
-        )
-        assert hash1 == hash2
-
-    def test_different_date_different_hash(self):
-        """Different dates should produce different hashes."""
-        hash1 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON",
-            "account-123"
-        )
-        hash2 = generate_transaction_hash(
-            date(2024, 1, 16),
-            Decimal("-50.00"),
-            "AMAZON",
-            "account-123"
-        )
-        assert hash1 != hash2
+_D_NEG_50 = Decimal("-50.00")
 
-    def test_different_amount_different_hash(self):
-        """Different amounts should produce different hashes."""
-        hash1 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON",
-            "account-123"
-        )
-        hash2 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-51.00"),
-            "AMAZON",
-            "account-123"
-        )
-        assert hash1 != hash2
+# Reference hash the invariant cases compare against
+H0 = generate_transaction_hash(date(2024, 1, 15), _D_NEG_50, "AMAZON", "account-123")
 
-    def test_different_description_different_hash(self):
-        """Different descriptions should produce different hashes."""
-        hash1 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON PURCHASE 1",
-            "account-123"
-        )
-        hash2 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON PURCHASE 2",
-            "account-123"
-        )
-        assert hash1 != hash2
 
-    def test_different_account_different_hash(self):
-        """Same transaction on different accounts should have different hashes."""
-        hash1 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON",
-            "account-123"
-        )
-        hash2 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON",
-            "account-456"
-        )
-        assert hash1 != hash2
-
-    def test_description_case_insensitive(self):
-        """Description comparison should be case-insensitive."""
-        hash1 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON PURCHASE",
-            "account-123"
-        )
-        hash2 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "amazon purchase",
-            "account-123"
-        )
-        assert hash1 == hash2
+class TestTransactionHash:
+    """Test hash generation for deduplication."""
 
-    def test_description_whitespace_trimmed(self):
-        """Leading/trailing whitespace should be trimmed."""
-        hash1 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON",
-            "account-123"
-        )
-        hash2 = generate_transaction_hash(
-            date(2024, 1, 15),
-            Decimal("-50.00"),
-            "  AMAZON  ",
-            "account-123"
-        )
-        assert hash1 == hash2
+    @pytest.mark.parametrize(
+        "b,equal",
+        [
+            pytest.param((date(2024, 1, 15), _D_NEG_50, "AMAZON", "account-123"), True, id="same-inputs"),
+            pytest.param((date(2024, 1, 16), _D_NEG_50, "AMAZON", "account-123"), False, id="date"),
+            pytest.param((date(2024, 1, 15), Decimal("-51.00"), "AMAZON", "account-123"), False, id="amount"),
+            pytest.param((date(2024, 1, 15), _D_NEG_50, "AMAZON 2", "account-123"), False, id="description"),
+            pytest.param((date(2024, 1, 15), _D_NEG_50, "AMAZON", "account-456"), False, id="account"),
+            pytest.param((date(2024, 1, 15), _D_NEG_50, "amazon", "account-123"), True, id="case-insensitive"),
+            pytest.param((date(2024, 1, 15), _D_NEG_50, "  AMAZON  ", "account-123"), True, id="whitespace-trimmed"),
+        ],
+    )
+    def test_hash_invariants(self, b, equal):
+        """Only date, amount, normalized description and account affect the hash."""
+        assert (generate_transaction_hash(*b) == H0) is equal
 
     def test_hash_is_sha256(self):
         """Hash should be 64 character hex string (SHA256)."""
+        assert len(H0) == 64
+        assert all(c in '0123456789abcdef' for c in H0)
+
+    def test_hash_format_stable(self):
+        """Hash must match the stored date|amount|description|account format."""
         hash_val = generate_transaction_hash(
             date(2024, 1, 15),
-            Decimal("-50.00"),
-            "AMAZON",
+            _D_NEG_50,
+            " Amazon ",
             "account-123"
         )
-        assert len(hash_val) == 64
-        assert all(c in '0123456789abcdef' for c in hash_val)
+        expected = hashlib.sha256(
+            "2024-01-15|-50.00|amazon|account-123".encode()
+        ).hexdigest()
+        assert hash_val == expected
+
+    def test_batch_matches_single(self):
+        """Batch hashing should match per-row hashing."""
+        txns = [
+            {"date": date(2024, 1, 15), "amount": _D_NEG_50, "raw_description": "AMAZON"},
+            {"date": date(2024, 1, 16), "amount": Decimal("12.34"), "raw_description": " Café "},
+        ]
+        hashes = generate_transaction_hashes(txns, "account-123")
+        assert hashes == [
+            generate_transaction_hash(t["date"], t["amount"], t["raw_description"], "account-123")
+            for t in txns
+        ]
 
 
 class TestIsDuplicate:
@@ -142,10 +79,76 @@ class TestIsDuplicate:
         """No duplicate when database is empty."""
         assert is_duplicate(db_session, "somehash123") is False
 
-    def test_finds_duplicate(self, db_session, sample_transaction):
-        """Should find existing transaction by hash."""
+    def test_is_duplicate(self, db_session, sample_transaction):
+        """Only a hash already stored counts as a duplicate."""
         assert is_duplicate(db_session, sample_transaction.hash) is True
-
-    def test_no_false_positive(self, db_session, sample_transaction):
-        """Should not match different hashes."""
         assert is_duplicate(db_session, "differenthash456") is False
+
+
+class TestGetExistingHashes:
+    """Test batched hash lookup."""
+
+    @pytest.mark.query_budget(19)
+    def test_chunked_lookup(self, db_session, sample_transaction, monkeypatch):
+        """Lookups split across chunks should still find every stored hash."""
+        monkeypatch.setattr(
+            "app.services.deduplication_service.HASH_LOOKUP_BATCH_SIZE", 1
+        )
+        hashes = ["missing-1", sample_transaction.hash, "missing-2"]
+
+        assert get_existing_hashes(db_session, hashes) == {sample_transaction.hash}
+
+
+class TestExistingHashesForAccount:
+    """Test the (date, amount) prefiltered hash lookup."""
+
+    def test_only_matching_rows_reported(self, db_session, sample_transaction):
+        """Only rows whose date/amount/hash match a stored row are duplicates."""
+        account_id = sample_transaction.account_id
+        txns = [
+            {"date": sample_transaction.date, "amount": sample_transaction.amount},
+            {"date": sample_transaction.date, "amount": Decimal("-1.23")},
+        ]
+        hashes = [sample_transaction.hash, "other-hash"]
+
+        existing = get_existing_hashes_for_account(db_session, account_id, txns, hashes)
+
+        assert existing == {sample_transaction.hash}
+
+    def test_other_account_not_matched(self, db_session, sample_transaction):
+        """Rows stored under another account are not candidates."""
+        txns = [{"date": sample_transaction.date, "amount": sample_transaction.amount}]
+
+        existing = get_existing_hashes_for_account(
+            db_session, "other-account", txns, [sample_transaction.hash]
+        )
+
+        assert existing == set()
+
+
+class TestBulkInsertConflicts:
+    """Test that bulk inserts ignore hashes already stored."""
+
+    @pytest.mark.query_budget(20)
+    def test_existing_hash_ignored(self, db_session, sample_transaction):
+        """Rows colliding on hash are skipped and not reported as inserted."""
+        rows = [
+            {
+                "id": f"new-{i}",
+                "hash": h,
+                "date": date(2024, 1, 16),
+                "amount": Decimal("-10.00"),
+                "raw_description": "STORE",
+                "clean_merchant": None,
+                "category_id": None,
+                "account_id": sample_transaction.account_id,
+                "ai_categorized": False,
+            }
+            for i, h in enumerate([sample_transaction.hash, "fresh-hash"])
+        ]
+
+        inserted = bulk_insert_transactions(db_session, rows)
+        db_session.commit()
+
+        assert inserted == {"new-1"}
+        assert db_session.query(Transaction).count() == 2
@@ -0,0 +1,31 @@
+"""Tests for time-ordered id generation."""
+
+import time
+import uuid
+
+from app.ids import new_id, uuid7_strings
+
+
+class TestUuid7Ids:
+    """Test batched time-ordered id generation for imported rows."""
+
+    def test_ids_are_unique_uuid7_strings(self):
+        """Batched ids must be valid hyphenated UUIDv7 strings."""
+        ids = uuid7_strings(500)
+
+        assert len(set(ids)) == 500
+        for value in ids:
+            parsed = uuid.UUID(value)
+            assert str(parsed) == value
+            assert parsed.version == 7
+            assert parsed.variant == uuid.RFC_4122
+
+    def test_later_batches_sort_after(self):
+        """Ids from a later millisecond sort after earlier ones."""
+        first = new_id()
+        time.sleep(0.002)
+        assert new_id() > first
+
+    def test_zero_count(self):
+        """No rows means no ids."""
+        assert uuid7_strings(0) == []
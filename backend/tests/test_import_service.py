@@ -0,0 +1,111 @@
+"""Tests for import service helpers."""
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.models.import_log import ImportLog, ImportStatus
+from app.models.pending_import import PendingImport
+from app.models.token_map import TokenMap, TokenType
+from app.services.import_service import (
+    _get_cached_categorizations,
+    cleanup_stale_pending,
+    save_pending,
+)
+
+
+def _add_stale_pending(db_session, tmp_path, import_id):
+    """Stage an upload that expired a day ago and return its file."""
+    path = tmp_path / f"{import_id}.csv"
+    path.write_text("date,amount\n")
+    db_session.add(
+        PendingImport(
+            id=import_id,
+            file_path=str(path),
+            filename=path.name,
+            parser_type="CSVParser",
+            created_at=datetime.utcnow() - timedelta(hours=48),
+        )
+    )
+    db_session.commit()
+    return path
+
+
+class TestCleanupStalePending:
+    """Test expiry of abandoned uploads."""
+
+    def test_stale_rows_and_files_removed(self, db_session, tmp_path):
+        """Expired rows are deleted along with their inbox files."""
+        stale_file = _add_stale_pending(db_session, tmp_path, "stale")
+        fresh_file = tmp_path / "fresh.csv"
+        fresh_file.write_text("date,amount\n")
+        db_session.add(
+            PendingImport(
+                id="fresh",
+                file_path=str(fresh_file),
+                filename="fresh.csv",
+                parser_type="CSVParser",
+            )
+        )
+        db_session.commit()
+
+        assert cleanup_stale_pending(db_session, max_age_hours=24) == 1
+
+        assert not stale_file.exists()
+        assert fresh_file.exists()
+        assert [p.id for p in db_session.query(PendingImport)] == ["fresh"]
+
+    def test_running_import_kept(self, db_session, tmp_path):
+        """An expired upload whose import is still processing is left alone."""
+        path = _add_stale_pending(db_session, tmp_path, "running")
+        db_session.add(
+            ImportLog(id="running", filename=path.name, status=ImportStatus.processing)
+        )
+        db_session.commit()
+
+        assert cleanup_stale_pending(db_session, max_age_hours=24) == 0
+
+        assert path.exists()
+        assert db_session.get(PendingImport, "running") is not None
+
+    def test_files_kept_when_save_commit_fails(self, db_session, tmp_path):
+        """save_pending only removes swept files once its commit succeeds."""
+        path = _add_stale_pending(db_session, tmp_path, "stale")
+
+        with patch.object(db_session, "commit", side_effect=RuntimeError("disk full")):
+            with pytest.raises(RuntimeError):
+                save_pending(db_session, "new", {"file_path": "new.csv"})
+
+        assert path.exists()
+
+
+class TestCachedCategorizations:
+    """Test reuse of categories stored with merchant tokens."""
+
+    @pytest.mark.query_budget(8)
+    def test_cached_categorizations(self, db_session):
+        """Cached lookup should match case/whitespace variants in one query."""
+        db_session.add_all([
+            TokenMap(
+                token_type=TokenType.merchant,
+                original_value="Whole Foods",
+                normalized_value="WHOLE FOODS",
+                token="MERCHANT_001",
+                metadata_={"category": "Food", "subcategory": "Groceries"},
+            ),
+            TokenMap(
+                token_type=TokenType.merchant,
+                original_value="Target",
+                normalized_value="TARGET",
+                token="MERCHANT_002",
+            ),
+        ])
+        db_session.commit()
+
+        result = _get_cached_categorizations(
+            ["whole foods", " Whole Foods ", "Target", "Costco"], db_session
+        )
+
+        assert set(result) == {"whole foods", " Whole Foods "}
+        assert result["whole foods"]["clean"] == "Whole Foods"
+        assert result["whole foods"]["subcategory"] == "Groceries"
@@ -1,11 +1,13 @@
 """Tests for net worth functionality."""
 
 import pytest
+import uuid
 from datetime import date, datetime
 from decimal import Decimal
 
 from app.models.account import Account, AccountType
 from app.models.balance_history import BalanceHistory
+from app.models.transaction import Transaction
 from app.services.networth_service import (
     get_current_networth,
     get_networth_breakdown,
@@ -378,11 +380,6 @@ class TestBalanceInference:
 
     def test_calculate_balance_from_transactions_bank_account(self, db_session):
         """Calculate balance for bank account from transactions."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account = Account(
             name="Bank Account",
             account_type=AccountType.checking,
@@ -435,11 +432,6 @@ class TestBalanceInference:
 
     def test_calculate_balance_from_transactions_credit_account(self, db_session):
         """Calculate balance for credit account from transactions."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account = Account(
             name="Credit Card",
             account_type=AccountType.credit_card,
@@ -478,11 +470,6 @@ class TestBalanceInference:
 
     def test_calculate_balance_from_transactions_cash_account(self, db_session):
         """Calculate balance for cash account from transactions."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account = Account(
             name="Cash Wallet",
             account_type=AccountType.cash,
@@ -521,11 +508,6 @@ class TestBalanceInference:
 
     def test_calculate_balance_from_transactions_no_current_balance(self, db_session):
         """Calculate balance when account has no current balance."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account = Account(
             name="New Account", account_type=AccountType.checking, current_balance=None
         )
@@ -553,9 +535,6 @@ class TestBalanceInference:
 
     def test_calculate_balance_from_transactions_no_transactions(self, db_session):
         """Calculate balance when account has no transactions."""
-        import uuid
-        from decimal import Decimal
-
         account = Account(
             name="Empty Account",
             account_type=AccountType.checking,
@@ -571,11 +550,6 @@ class TestBalanceInference:
 
     def test_get_balance_difference_stale_balance(self, db_session):
         """Get balance difference when manual balance differs from calculated."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account = Account(
             name="Stale Balance Account",
             account_type=AccountType.checking,
@@ -607,11 +581,6 @@ class TestBalanceInference:
 
     def test_get_balance_difference_current_balance(self, db_session):
         """Get balance difference when manual balance matches calculated."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account = Account(
             name="Current Balance Account",
             account_type=AccountType.checking,
@@ -634,11 +603,6 @@ class TestBalanceInference:
 
     def test_get_accounts_with_stale_balances(self, db_session):
         """Get all accounts with stale balances."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account1 = Account(
             name="Stale Account",
             account_type=AccountType.checking,
@@ -685,11 +649,6 @@ class TestBalanceInference:
 
     def test_infer_balance_from_transactions(self, db_session):
         """Infer and update balance from transactions."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account = Account(
             name="Test Account",
             account_type=AccountType.checking,
@@ -733,11 +692,6 @@ class TestBalanceInference:
 
     def test_get_networth_breakdown_with_calculated_balance(self, db_session):
         """Test that net worth breakdown includes calculated balances."""
-        import uuid
-        from datetime import date
-        from decimal import Decimal
-        from app.models.transaction import Transaction
-
         account1 = Account(
             name="Stale Asset Account",
             account_type=AccountType.checking,
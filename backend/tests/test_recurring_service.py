@@ -1,12 +1,18 @@
 """Tests for recurring service date calculations and group management."""
 
 import pytest
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy import insert
 
 from app.services.recurring_service import (
     calculate_next_expected,
+    create_recurring_group_from_detection,
+    detect_recurring_patterns,
     get_group_transaction_count,
+    mark_transaction_recurring,
 )
 from app.models.recurring import Frequency
 from app.models.transaction import Transaction
@@ -38,8 +44,23 @@ class TestCalculateNextExpected:
     def test_monthly_end_of_month(self):
         """Monthly on 31st should handle shorter months."""
         result = calculate_next_expected(date(2024, 1, 31), Frequency.monthly)
-        # February doesn't have 31 days, should fall back to 28
-        assert result == date(2024, 2, 28)
+        # February doesn't have 31 days; clamp to its last day (2024 is a leap year)
+        assert result == date(2024, 2, 29)
+
+    def test_monthly_clamps_to_month_end(self):
+        """Monthly from a 31st into a 30-day month should land on the 30th."""
+        result = calculate_next_expected(date(2024, 3, 31), Frequency.monthly)
+        assert result == date(2024, 4, 30)
+
+    def test_quarterly_end_of_month(self):
+        """Quarterly should clamp the same way."""
+        result = calculate_next_expected(date(2023, 11, 30), Frequency.quarterly)
+        assert result == date(2024, 2, 29)
+
+    def test_monthly_century_non_leap(self):
+        """2100 is not a leap year, so February ends on the 28th."""
+        result = calculate_next_expected(date(2100, 1, 31), Frequency.monthly)
+        assert result == date(2100, 2, 28)
 
     def test_quarterly(self):
         """Quarterly should add 3 months."""
@@ -71,21 +92,26 @@ class TestGroupTransactionCount:
         count = get_group_transaction_count(db_session, sample_recurring_group.id)
         assert count == 0
 
+    @pytest.mark.query_budget(21)
     def test_with_transactions(self, db_session, sample_recurring_group, sample_account):
         """Should count transactions in group."""
         # Add transactions to the recurring group
-        for i in range(3):
-            txn = Transaction(
-                id=f"txn-{i}",
-                hash=f"hash-{i}",
-                date=date(2024, 1, i + 1),
-                amount=Decimal("-15.99"),
-                raw_description="NETFLIX",
-                account_id=sample_account.id,
-                recurring_group_id=sample_recurring_group.id,
-                is_recurring=True
-            )
-            db_session.add(txn)
+        db_session.execute(
+            insert(Transaction),
+            [
+                {
+                    "id": f"txn-{i}",
+                    "hash": f"hash-{i}",
+                    "date": date(2024, 1, i + 1),
+                    "amount": Decimal("-15.99"),
+                    "raw_description": "NETFLIX",
+                    "account_id": sample_account.id,
+                    "recurring_group_id": sample_recurring_group.id,
+                    "is_recurring": True,
+                }
+                for i in range(3)
+            ],
+        )
         db_session.commit()
 
         count = get_group_transaction_count(db_session, sample_recurring_group.id)
@@ -96,3 +122,195 @@ class TestGroupTransactionCount:
         # sample_transaction is not in sample_recurring_group
         count = get_group_transaction_count(db_session, sample_recurring_group.id)
         assert count == 0
+
+
+class TestDetectRecurringPatterns:
+    """Test which transactions are sent for AI recurring detection."""
+
+    @pytest.mark.query_budget(24)
+    async def test_only_repeated_merchants_sent(self, db_session, sample_account):
+        """Merchants seen fewer than three times should be left out of the prompt."""
+        today = date.today()
+        rows = [("NETFLIX", i) for i in range(5)] + [("ONE OFF SHOP", 0), ("GIFT STORE", 1)]
+        for i, (merchant, months_ago) in enumerate(rows):
+            db_session.add(
+                Transaction(
+                    id=f"txn-{i}",
+                    hash=f"hash-{i}",
+                    date=today - timedelta(days=30 * months_ago + 1),
+                    amount=Decimal("-15.99"),
+                    raw_description=merchant,
+                    account_id=sample_account.id,
+                )
+            )
+        db_session.commit()
+
+        client = MagicMock(model="test-model")
+        client.complete_json = AsyncMock(return_value={"recurring_patterns": []})
+        with patch("app.services.recurring_service.get_ai_client", return_value=client):
+            await detect_recurring_patterns(db_session)
+
+        prompt = client.complete_json.await_args.kwargs["user_prompt"]
+        assert all(f'"txn-{i}"' in prompt for i in range(5))
+        assert '"txn-5"' not in prompt and '"txn-6"' not in prompt
+        assert '"amount": -15.99' in prompt
+
+    @pytest.mark.query_budget(34)
+    async def test_shards_by_merchant_and_merges(self, db_session, sample_account):
+        """Each merchant should land in one shard; failed shards are skipped."""
+        today = date.today()
+        merchants = ["NETFLIX", "SPOTIFY", "GYM"]
+        for m, merchant in enumerate(merchants):
+            for i in range(3):
+                db_session.add(
+                    Transaction(
+                        id=f"txn-{m}-{i}",
+                        hash=f"hash-{m}-{i}",
+                        date=today - timedelta(days=30 * i + 1),
+                        amount=Decimal("-9.99"),
+                        raw_description=merchant,
+                        account_id=sample_account.id,
+                    )
+                )
+        db_session.commit()
+
+        client = MagicMock(model="test-model")
+        client.complete_json = AsyncMock(
+            side_effect=[
+                {"recurring_patterns": [{"merchant_pattern": "a", "confidence": 0.9}]},
+                RuntimeError("provider down"),
+                {"recurring_patterns": [{"merchant_pattern": "c", "confidence": 0.8}]},
+            ]
+        )
+        with patch(
+            "app.services.recurring_service.get_ai_client", return_value=client
+        ), patch("app.services.recurring_service.RECURRING_SHARD_SIZE", 4):
+            patterns = await detect_recurring_patterns(db_session)
+
+        assert client.complete_json.await_count == 3
+        for call in client.complete_json.await_args_list:
+            prompt = call.kwargs["user_prompt"]
+            present = [m for m in range(3) if f'"txn-{m}-0"' in prompt]
+            assert len(present) == 1
+            assert all(f'"txn-{present[0]}-{i}"' in prompt for i in range(3))
+        assert [p["merchant_pattern"] for p in patterns] == ["a", "c"]
+
+        # A re-run only retries the shard that failed; the rest come from the cache
+        client.complete_json = AsyncMock(
+            return_value={"recurring_patterns": [{"merchant_pattern": "b", "confidence": 0.7}]}
+        )
+        with patch(
+            "app.services.recurring_service.get_ai_client", return_value=client
+        ), patch("app.services.recurring_service.RECURRING_SHARD_SIZE", 4):
+            patterns = await detect_recurring_patterns(db_session)
+
+        assert client.complete_json.await_count == 1
+        assert [p["merchant_pattern"] for p in patterns] == ["a", "b", "c"]
+
+    @pytest.mark.query_budget(38)
+    async def test_new_charge_keeps_other_shard_keys(self, db_session, sample_account):
+        """A new charge should only invalidate the cached shard of its merchant."""
+        today = date.today()
+        merchants = ["NETFLIX", "SPOTIFY", "GYM", "ICLOUD"]
+        db_session.execute(
+            insert(Transaction),
+            [
+                {
+                    "id": f"txn-{m}-{i}",
+                    "hash": f"hash-{m}-{i}",
+                    "date": today - timedelta(days=30 * i + m + 1),
+                    "amount": Decimal("-9.99"),
+                    "raw_description": merchant,
+                    "account_id": sample_account.id,
+                }
+                for m, merchant in enumerate(merchants)
+                for i in range(3)
+            ],
+        )
+        db_session.commit()
+
+        client = MagicMock(model="test-model")
+        client.complete_json = AsyncMock(return_value={"recurring_patterns": []})
+        with patch(
+            "app.services.recurring_service.get_ai_client", return_value=client
+        ), patch("app.services.recurring_service.RECURRING_SHARD_SIZE", 7):
+            await detect_recurring_patterns(db_session)
+            assert client.complete_json.await_count == 2
+
+            # The least recent merchant becomes the most recent one
+            db_session.add(
+                Transaction(
+                    id="txn-new",
+                    hash="hash-new",
+                    date=today,
+                    amount=Decimal("-9.99"),
+                    raw_description="ICLOUD",
+                    account_id=sample_account.id,
+                )
+            )
+            db_session.commit()
+            client.complete_json.reset_mock()
+            await detect_recurring_patterns(db_session)
+
+        assert client.complete_json.await_count == 1
+        prompt = client.complete_json.await_args.kwargs["user_prompt"]
+        assert '"txn-new"' in prompt and '"txn-0-0"' not in prompt
+
+
+class TestCreateGroupFromDetection:
+    """Test creating a recurring group from an AI detection."""
+
+    @pytest.mark.query_budget(16)
+    def test_links_transactions_and_sets_dates(self, db_session, sample_account):
+        """Linked transactions should set last_seen and next_expected dates."""
+        for i, day in enumerate([5, 20, 12]):
+            db_session.add(
+                Transaction(
+                    id=f"txn-{i}",
+                    hash=f"hash-{i}",
+                    date=date(2024, 1, day),
+                    amount=Decimal("-15.99"),
+                    raw_description="NETFLIX",
+                    account_id=sample_account.id,
+                )
+            )
+        db_session.commit()
+
+        group = create_recurring_group_from_detection(
+            db_session,
+            {
+                "suggested_name": "Netflix",
+                "merchant_pattern": "NETFLIX",
+                "average_amount": -15.99,
+                "frequency": "monthly",
+                "transaction_ids": ["txn-0", "txn-1", "txn-2"],
+            },
+        )
+
+        assert group.last_seen_date == date(2024, 1, 20)
+        assert group.next_expected_date == date(2024, 2, 20)
+        assert get_group_transaction_count(db_session, group.id) == 3
+
+
+class TestMarkTransactionRecurring:
+    """Test linking a single transaction to a recurring group."""
+
+    @pytest.mark.query_budget(28)
+    def test_link_existing_group(self, db_session, sample_recurring_group, sample_transaction):
+        """Linking a newer transaction should advance the group's dates."""
+        group = mark_transaction_recurring(
+            db_session, sample_transaction.id, recurring_group_id=sample_recurring_group.id
+        )
+
+        assert group.last_seen_date == date(2024, 1, 15)
+        assert group.next_expected_date == date(2024, 2, 15)
+        db_session.refresh(sample_transaction)
+        assert sample_transaction.recurring_group_id == group.id
+        assert sample_transaction.is_recurring is True
+
+    def test_link_missing_transaction(self, db_session, sample_recurring_group):
+        """An unknown transaction id should raise."""
+        with pytest.raises(ValueError, match="not found"):
+            mark_transaction_recurring(
+                db_session, "missing", recurring_group_id=sample_recurring_group.id
+            )
@@ -13,64 +13,34 @@ This test validates the core import workflow:
 import pytest
 import uuid
 import asyncio
-from datetime import date, timedelta
+import os
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from io import BytesIO
+from unittest.mock import AsyncMock, patch
 
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from app.main import app
-from app.dependencies import get_db
 from app.models.account import Account, AccountType
 from app.models.category import Category
 from app.models.transaction import Transaction
 from app.models.budget import Budget, BudgetPeriod
 from app.models.alert import AlertSettings
+from app.models.pending_import import PendingImport
 from app.seed import seed_categories
-from app.services.import_service import save_upload, get_preview, process_import
+from app.services.import_service import (
+    save_upload,
+    get_preview,
+    process_import,
+    save_pending,
+    get_pending,
+)
+from app.services.budget_alerts import check_all_budget_alerts
 from app.services.deduplication_service import generate_transaction_hash
 from app.schemas.import_file import ImportConfirmRequest, ColumnMapping
 
 
-@pytest.fixture(scope="function")
-def smoke_db_session():
-    from sqlalchemy import create_engine
-    from sqlalchemy.pool import StaticPool
-    from sqlalchemy.orm import sessionmaker
-    from app.database import Base
-
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    Base.metadata.create_all(bind=engine)
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    session = TestingSessionLocal()
-
-    try:
-        yield session
-    finally:
-        session.close()
-        Base.metadata.drop_all(bind=engine)
-        engine.dispose()
-
-
-@pytest.fixture(scope="function")
-def smoke_client(smoke_db_session):
-    def override_get_db():
-        try:
-            yield smoke_db_session
-        finally:
-            pass
-
-    app.dependency_overrides[get_db] = override_get_db
-    with TestClient(app) as test_client:
-        yield test_client
-    app.dependency_overrides.clear()
-
-
 def _run_async(coro):
     """Helper to run async functions in sync tests."""
     try:
@@ -86,7 +56,7 @@ def _run_async(coro):
 
 class TestSmokeE2E:
     def test_full_import_workflow(
-        self, smoke_db_session: Session, smoke_client: TestClient
+        self, db_session: Session, client: TestClient
     ):
         account = Account(
             id=str(uuid.uuid4()),
@@ -95,8 +65,8 @@ class TestSmokeE2E:
             is_active=True,
             current_balance=Decimal("1000.00"),
         )
-        smoke_db_session.add(account)
-        smoke_db_session.commit()
+        db_session.add(account)
+        db_session.commit()
 
         parent = Category(
             id=str(uuid.uuid4()),
@@ -113,8 +83,8 @@ class TestSmokeE2E:
             icon="shopping-cart",
             is_system=True,
         )
-        smoke_db_session.add_all([parent, child])
-        smoke_db_session.commit()
+        db_session.add_all([parent, child])
+        db_session.commit()
 
         csv_content = b"""date,amount,description
 2024-01-15,-50.00,WHOLE FOODS #1234
@@ -122,11 +92,11 @@ class TestSmokeE2E:
 2024-01-17,1500.00,PAYROLL DEPOSIT
 2024-01-18,-12.99,NETFLIX.COM
 """
-        file_path, import_id = save_upload(csv_content, "test_transactions.csv")
+        file_path, import_id = save_upload(BytesIO(csv_content), "test_transactions.csv")
 
         try:
             preview = get_preview(
-                smoke_db_session, file_path, import_id, "test_transactions.csv"
+                db_session, file_path, import_id, "test_transactions.csv"
             )
 
             assert preview.row_count == 4
@@ -145,7 +115,7 @@ class TestSmokeE2E:
 
             # process_import is async
             result = _run_async(
-                process_import(smoke_db_session, import_id, request, use_ai=False)
+                process_import(db_session, import_id, request, use_ai=False)
             )
 
             assert result.status == "completed"
@@ -153,7 +123,7 @@ class TestSmokeE2E:
             assert result.transactions_skipped == 0
 
             transactions = (
-                smoke_db_session.query(Transaction)
+                db_session.query(Transaction)
                 .filter(Transaction.account_id == account.id)
                 .all()
             )
@@ -163,7 +133,7 @@ class TestSmokeE2E:
             amounts = sorted([float(t.amount) for t in transactions])
             assert amounts == [-50.0, -25.5, -12.99, 1500.0]
 
-            response = smoke_client.get("/api/v1/dashboard/summary?month=2024-01")
+            response = client.get("/api/v1/dashboard/summary?month=2024-01")
             assert response.status_code == 200
             data = response.json()
 
@@ -172,38 +142,36 @@ class TestSmokeE2E:
             assert data["net"] == pytest.approx(1411.51, rel=0.01)
 
         finally:
-            import os
-
             if file_path.exists():
                 os.remove(file_path)
 
-    def test_empty_state_no_crash(self, smoke_client: TestClient):
-        response = smoke_client.get("/api/v1/accounts")
+    def test_empty_state_no_crash(self, client: TestClient):
+        response = client.get("/api/v1/accounts")
         assert response.status_code == 200
         assert response.json()["total"] == 0
 
-        response = smoke_client.get("/api/v1/transactions")
+        response = client.get("/api/v1/transactions")
         assert response.status_code == 200
         assert response.json()["total"] == 0
 
-        response = smoke_client.get("/api/v1/budgets")
+        response = client.get("/api/v1/budgets")
         assert response.status_code == 200
         data = response.json()
         assert data["total"] == 0
         assert len(data["items"]) == 0
 
-        response = smoke_client.get("/api/v1/dashboard/summary")
+        response = client.get("/api/v1/dashboard/summary")
         assert response.status_code == 200
 
-    def test_duplicate_detection(self, smoke_db_session: Session):
+    def test_duplicate_detection(self, db_session: Session):
         account = Account(
             id=str(uuid.uuid4()),
             name="Test Checking",
             account_type=AccountType.checking,
             is_active=True,
         )
-        smoke_db_session.add(account)
-        smoke_db_session.commit()
+        db_session.add(account)
+        db_session.commit()
 
         # Generate the same hash the import service will generate
         dup_hash = generate_transaction_hash(
@@ -218,18 +186,18 @@ class TestSmokeE2E:
             account_id=account.id,
             ai_categorized=False,
         )
-        smoke_db_session.add(txn1)
-        smoke_db_session.commit()
+        db_session.add(txn1)
+        db_session.commit()
 
         csv_content = b"""date,amount,description
 2024-01-15,-50.00,WHOLE FOODS
 2024-01-16,-25.00,OTHER STORE
 """
-        file_path, import_id = save_upload(csv_content, "test_dup.csv")
+        file_path, import_id = save_upload(BytesIO(csv_content), "test_dup.csv")
 
         try:
             # Need to populate pending import via get_preview
-            get_preview(smoke_db_session, file_path, import_id, "test_dup.csv")
+            get_preview(db_session, file_path, import_id, "test_dup.csv")
 
             request = ImportConfirmRequest(
                 account_id=account.id,
@@ -243,30 +211,199 @@ class TestSmokeE2E:
 
             # process_import is async
             result = _run_async(
-                process_import(smoke_db_session, import_id, request, use_ai=False)
+                process_import(db_session, import_id, request, use_ai=False)
             )
 
             assert result.transactions_imported == 1
             assert result.transactions_skipped == 1
 
             total = (
-                smoke_db_session.query(Transaction)
+                db_session.query(Transaction)
                 .filter(Transaction.account_id == account.id)
                 .count()
             )
             assert total == 2
 
         finally:
-            import os
+            if file_path.exists():
+                os.remove(file_path)
+
+    def test_duplicate_rows_within_file(self, db_session: Session):
+        account = Account(
+            id=str(uuid.uuid4()),
+            name="Test Checking",
+            account_type=AccountType.checking,
+            is_active=True,
+        )
+        db_session.add(account)
+        db_session.commit()
+
+        csv_content = b"""date,amount,description
+2024-01-15,-50.00,WHOLE FOODS
+2024-01-15,-50.00,WHOLE FOODS
+2024-01-16,-25.00,OTHER STORE
+"""
+        file_path, import_id = save_upload(BytesIO(csv_content), "test_dup_in_file.csv")
+
+        try:
+            get_preview(db_session, file_path, import_id, "test_dup_in_file.csv")
+
+            request = ImportConfirmRequest(
+                account_id=account.id,
+                column_mapping=ColumnMapping(
+                    date_col=0,
+                    amount_col=1,
+                    description_col=2,
+                ),
+                date_format="%Y-%m-%d",
+            )
+
+            result = _run_async(
+                process_import(db_session, import_id, request, use_ai=False)
+            )
+
+            assert result.status == "completed"
+            assert result.transactions_imported == 2
+            assert result.transactions_skipped == 1
+
+        finally:
+            if file_path.exists():
+                os.remove(file_path)
+
+    def test_ai_import_dedupes_ai_calls(self, db_session: Session):
+        account = Account(
+            id=str(uuid.uuid4()),
+            name="Test Checking",
+            account_type=AccountType.checking,
+            is_active=True,
+        )
+        category = Category(id=str(uuid.uuid4()), name="Coffee")
+        db_session.add_all([account, category])
+        db_session.commit()
+
+        csv_content = b"""date,amount,description
+2024-01-15,-4.50,STARBUCKS #123
+2024-01-16,-5.25,starbucks #123
+2024-01-17,-3.75,STARBUCKS #123
+2024-01-17,-3.75,STARBUCKS #123
+"""
+        file_path, import_id = save_upload(BytesIO(csv_content), "test_ai.csv")
+
+        try:
+            get_preview(db_session, file_path, import_id, "test_ai.csv")
+
+            request = ImportConfirmRequest(
+                account_id=account.id,
+                column_mapping=ColumnMapping(
+                    date_col=0,
+                    amount_col=1,
+                    description_col=2,
+                ),
+                date_format="%Y-%m-%d",
+            )
+
+            clean_mock = AsyncMock(return_value="Starbucks")
+            categorize_mock = AsyncMock(
+                return_value={"category_id": category.id, "confidence": 0.9}
+            )
+            with patch(
+                "app.services.import_service.settings.ai_auto_categorize", True
+            ), patch(
+                "app.services.import_service.clean_merchant_name", clean_mock
+            ), patch(
+                "app.services.import_service.categorize_transaction_with_context",
+                categorize_mock,
+            ):
+                result = _run_async(
+                    process_import(db_session, import_id, request, use_ai=True)
+                )
+
+            assert result.transactions_imported == 3
+            assert result.transactions_skipped == 1
+            assert clean_mock.await_count == 1
+            assert categorize_mock.await_count == 1
+            # The system prompt is rendered once per import and passed in
+            assert category.id in categorize_mock.await_args.kwargs["system_prompt"]
+
+            transactions = (
+                db_session.query(Transaction)
+                .filter(Transaction.account_id == account.id)
+                .all()
+            )
+            assert {t.clean_merchant for t in transactions} == {"Starbucks"}
+            assert {t.category_id for t in transactions} == {category.id}
+
+        finally:
+            if file_path.exists():
+                os.remove(file_path)
+
+    def test_alert_failure_keeps_import(self, db_session: Session):
+        account = Account(
+            id=str(uuid.uuid4()),
+            name="Test Checking",
+            account_type=AccountType.checking,
+            is_active=True,
+        )
+        db_session.add(account)
+        db_session.commit()
+
+        csv_content = b"""date,amount,description
+2024-01-15,-50.00,WHOLE FOODS
+2024-01-16,-25.00,OTHER STORE
+"""
+        file_path, import_id = save_upload(BytesIO(csv_content), "test_alert_fail.csv")
+
+        try:
+            get_preview(db_session, file_path, import_id, "test_alert_fail.csv")
+
+            request = ImportConfirmRequest(
+                account_id=account.id,
+                column_mapping=ColumnMapping(
+                    date_col=0,
+                    amount_col=1,
+                    description_col=2,
+                ),
+                date_format="%Y-%m-%d",
+            )
+
+            with patch(
+                "app.services.import_service.analyze_transactions_for_alerts_batch",
+                side_effect=RuntimeError("boom"),
+            ):
+                result = _run_async(
+                    process_import(db_session, import_id, request, use_ai=False)
+                )
 
+            assert result.status == "completed"
+            db_session.rollback()
+            total = (
+                db_session.query(Transaction)
+                .filter(Transaction.account_id == account.id)
+                .count()
+            )
+            assert total == 2
+
+        finally:
             if file_path.exists():
                 os.remove(file_path)
 
+    def test_expired_pending_import(self, db_session: Session):
+        save_pending(db_session, "old-import", {"filename": "old.csv"})
+        db_session.query(PendingImport).update(
+            {PendingImport.created_at: datetime(2000, 1, 1)}
+        )
+        db_session.commit()
+
+        assert get_pending(db_session, "old-import") is None
+
+        # The next upload sweeps the stale row
+        save_pending(db_session, "new-import", {"filename": "new.csv"})
+        assert db_session.query(PendingImport).count() == 1
+        assert get_pending(db_session, "new-import")["filename"] == "new.csv"
+
     def test_budget_alert_flow(
-        self, smoke_db_session: Session, smoke_client: TestClient
+        self, db_session: Session, client: TestClient
     ):
-        from app.services.budget_alerts import check_all_budget_alerts
-
         account = Account(
             id=str(uuid.uuid4()),
             name="Test Checking",
@@ -279,8 +416,8 @@ class TestSmokeE2E:
             color="#22c55e",
             is_system=True,
         )
-        smoke_db_session.add_all([account, category])
-        smoke_db_session.commit()
+        db_session.add_all([account, category])
+        db_session.commit()
 
         budget = Budget(
             id=str(uuid.uuid4()),
@@ -290,7 +427,7 @@ class TestSmokeE2E:
             start_date=date.today().replace(day=1),
             is_active=True,
         )
-        smoke_db_session.add(budget)
+        db_session.add(budget)
 
         alert_settings = AlertSettings(
             id=str(uuid.uuid4()),
@@ -298,8 +435,8 @@ class TestSmokeE2E:
             unusual_merchant_threshold=Decimal("200.0"),
             alerts_enabled=True,
         )
-        smoke_db_session.add(alert_settings)
-        smoke_db_session.commit()
+        db_session.add(alert_settings)
+        db_session.commit()
 
         for i, amount in enumerate([-30.00, -40.00, -50.00]):
             txn = Transaction(
@@ -312,10 +449,10 @@ class TestSmokeE2E:
                 category_id=category.id,
                 ai_categorized=False,
             )
-            smoke_db_session.add(txn)
-        smoke_db_session.commit()
+            db_session.add(txn)
+        db_session.commit()
 
-        check_all_budget_alerts(smoke_db_session)
+        check_all_budget_alerts(db_session)
 
-        response = smoke_client.get("/api/v1/alerts")
+        response = client.get("/api/v1/alerts")
         assert response.status_code == 200
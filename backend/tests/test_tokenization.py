@@ -1,9 +1,21 @@
 """Tests for tokenization service."""
 
 import pytest
-from datetime import date
+import re
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from app.services.tokenization_service import TokenizationService
 from app.models.token_map import TokenMap, TokenType, DateShift
+from app.models.privacy_settings import (
+    PrivacySettings,
+    get_obfuscation_flags,
+    get_or_create_privacy_settings,
+    invalidate_cache as invalidate_privacy_cache,
+)
+from tests.conftest import assert_max_queries
 
 
 class TestMerchantTokenization:
@@ -56,6 +68,17 @@ class TestMerchantTokenization:
         assert token_map.metadata_["category"] == "Groceries"
         assert token_map.metadata_["subcategory"] == "Supermarket"
 
+    def test_committed_tokens_shared_across_instances(self, db_session):
+        """A fresh instance reuses committed merchant tokens without querying."""
+        with TokenizationService(db_session) as service:
+            token = service.tokenize_merchant("Whole Foods")
+
+        fresh = TokenizationService(db_session)
+        with assert_max_queries(db_session, 0):
+            assert fresh.tokenize_merchant("whole foods") == token
+            assert fresh.tokenize_many(["WHOLE FOODS"], TokenType.merchant) == [token]
+            assert fresh.detokenize(token) == "Whole Foods"
+
 
 class TestPersonTokenization:
     """Tests for person name tokenization in descriptions."""
@@ -80,6 +103,27 @@ class TestPersonTokenization:
         assert "PERSON_" in result
         assert "JANE DOE" not in result
 
+    def test_lowercase_and_multiple_services(self, db_session):
+        """Each match gets its own person token, regardless of case."""
+        service = TokenizationService(db_session)
+
+        result = service.tokenize_description("Zelle to jane doe; PAYPAL *BOB JONES")
+        jane = service._tokenize_person("JANE DOE")
+
+        assert result.startswith(f"ZELLE {jane}")
+        assert "PAYPAL PERSON_" in result
+        assert result.count(jane) == 1
+        assert "jane" not in result.lower()
+
+    def test_no_platform_keyword_unchanged(self, db_session):
+        """Descriptions without a payment platform are returned as-is."""
+        service = TokenizationService(db_session)
+
+        with assert_max_queries(db_session, 0):
+            result = service.tokenize_description("WHOLE FOODS MARKET #10234")
+
+        assert result == "WHOLE FOODS MARKET #10234"
+
     def test_same_person_same_token(self, db_session):
         """Same person should get same token."""
         service = TokenizationService(db_session)
@@ -88,7 +132,6 @@ class TestPersonTokenization:
         result2 = service.tokenize_description("ZELLE TO JOHN SMITH")
 
         # Extract tokens
-        import re
         tokens1 = re.findall(r'PERSON_\d+', result1)
         tokens2 = re.findall(r'PERSON_\d+', result2)
 
@@ -128,6 +171,14 @@ class TestDateShifting:
 
         assert unshifted == original
 
+    def test_shift_shared_across_instances(self, db_session):
+        """A fresh instance reuses the loaded shift without querying."""
+        shifted = TokenizationService(db_session).shift_date(date(2024, 1, 15))
+
+        fresh = TokenizationService(db_session)
+        with assert_max_queries(db_session, 0):
+            assert fresh.shift_date(date(2024, 1, 15)) == shifted
+
 
 class TestDetokenization:
     """Tests for de-tokenizing AI responses."""
@@ -159,6 +210,37 @@ class TestDetokenization:
         assert "Whole Foods" in result
         assert "Trader Joes" in result
 
+    @pytest.mark.query_budget(14)
+    def test_detokenize_fresh_instance(self, db_session):
+        """A new instance loads nothing up front and fetches only referenced tokens."""
+        token = TokenizationService(db_session).tokenize_merchant("Whole Foods")
+        TokenizationService(db_session).tokenize_merchant("Trader Joes")
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db_session.bind, "before_cursor_execute", listener)
+        try:
+            service = TokenizationService(db_session)
+            assert statements == []
+            result = service.detokenize(f"Spent at {token} and MERCHANT_9999")
+        finally:
+            event.remove(db_session.bind, "before_cursor_execute", listener)
+
+        assert result == "Spent at Whole Foods and MERCHANT_9999"
+        assert len(statements) == 1
+
+    def test_detokenize_single_pass(self, db_session):
+        """Replaced values are not re-scanned; unknown tokens are left as-is."""
+        service = TokenizationService(db_session)
+
+        token1 = service.tokenize_merchant("Whole Foods")
+        token2 = service.tokenize_merchant("Trader Joes")
+        service._reverse_cache[token1] = f"Store {token2}"
+
+        result = service.detokenize(f"{token1} and MERCHANT_9999")
+
+        assert result == f"Store {token2} and MERCHANT_9999"
+
 
 class TestBulkOperations:
     """Tests for bulk tokenization operations."""
@@ -180,6 +262,134 @@ class TestBulkOperations:
         assert "Whole Foods" not in unknown
         assert "Trader Joes" not in unknown
 
+    @pytest.mark.query_budget(13)
+    def test_tokenize_many(self, db_session):
+        """Batch tokenization should reuse known tokens and number new ones in order."""
+        service = TokenizationService(db_session)
+        known = service.tokenize_merchant("Whole Foods")
+
+        tokens = service.tokenize_many(
+            ["Target", "whole foods", " TARGET ", "Costco"], TokenType.merchant
+        )
+
+        assert tokens[1] == known
+        assert tokens[0] == tokens[2]
+        assert tokens[0] == "MERCHANT_0002"
+        assert tokens[3] == "MERCHANT_0003"
+        assert service.tokenize_merchant("Costco") == tokens[3]
+        assert db_session.query(TokenMap).count() == 3
+
+    def test_tokenize_many_stores_metadata(self, db_session):
+        """Batch-inserted rows keep their per-value metadata."""
+        service = TokenizationService(db_session)
+
+        (token,) = service.tokenize_many(
+            ["Whole Foods"], TokenType.merchant, [{"category": "Groceries"}]
+        )
+
+        row = db_session.query(TokenMap).filter(TokenMap.token == token).one()
+        assert row.metadata_ == {"category": "Groceries"}
+        assert row.original_value == "Whole Foods"
+
+    def test_tokenize_many_sees_rows_added_after_load(self, db_session):
+        """Tokens created by another service instance are found, not duplicated."""
+        service = TokenizationService(db_session)
+        other = TokenizationService(db_session)
+        token = other.tokenize_merchant("Target")
+
+        assert service.tokenize_many(["Target"], TokenType.merchant) == [token]
+        assert db_session.query(TokenMap).count() == 1
+
+    def test_stale_counter_recovers_from_collision(self, db_session):
+        """A token created elsewhere after load should not break numbering."""
+        service = TokenizationService(db_session)
+        other = TokenizationService(db_session)
+        taken = other.tokenize_merchant("Target")
+
+        token = service.tokenize_merchant("Costco")
+
+        assert token != taken
+        assert token == "MERCHANT_0002"
+
+    @pytest.mark.query_budget(20)
+    def test_context_manager_commits_once(self, db_session):
+        """New tokens are flushed per call and committed once on exit."""
+        with patch.object(db_session, "commit", wraps=db_session.commit) as commit:
+            with TokenizationService(db_session) as service:
+                service.tokenize_merchant("Target")
+                service.tokenize_merchant("Costco")
+                service.tokenize_description("VENMO JOHN SMITH")
+                assert commit.call_count == 0
+
+        assert commit.call_count == 1
+        db_session.rollback()
+        assert db_session.query(TokenMap).count() == 3
+
+    @pytest.mark.query_budget(9)
+    def test_get_unknown_merchants_checks_db_once(self, db_session):
+        """Merchants tokenized by another instance are known without per-row queries."""
+        service = TokenizationService(db_session)
+        TokenizationService(db_session).tokenize_merchant("Target")
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db_session.bind, "before_cursor_execute", listener)
+        try:
+            unknown = service.get_unknown_merchants(["target", "Costco", "Aldi"])
+        finally:
+            event.remove(db_session.bind, "before_cursor_execute", listener)
+
+        assert unknown == ["Costco", "Aldi"]
+        assert len(statements) == 1
+
+    def test_get_unknown_merchants_chunked(self, db_session, monkeypatch):
+        """Lookups split across chunks should still find every known merchant."""
+        monkeypatch.setattr(
+            "app.services.tokenization_service.TOKEN_LOOKUP_BATCH_SIZE", 1
+        )
+        TokenizationService(db_session).tokenize_many(["Target", "Aldi"], TokenType.merchant)
+
+        service = TokenizationService(db_session)
+        with assert_max_queries(db_session, 3):
+            unknown = service.get_unknown_merchants(["Target", "Costco", "Aldi"])
+
+        assert unknown == ["Costco"]
+
+    @pytest.mark.query_budget(20)
+    def test_tokenize_many_and_get_originals_chunked(self, db_session, monkeypatch):
+        """Chunked lookups should reuse stored tokens and resolve every original."""
+        monkeypatch.setattr(
+            "app.services.tokenization_service.TOKEN_LOOKUP_BATCH_SIZE", 1
+        )
+        known = TokenizationService(db_session).tokenize_many(
+            ["Target", "Aldi"], TokenType.merchant
+        )
+
+        tokens = TokenizationService(db_session).tokenize_many(
+            ["Target", "Aldi", "Costco"], TokenType.merchant
+        )
+        assert tokens[:2] == known
+
+        service = TokenizationService(db_session)
+        with assert_max_queries(db_session, 4):
+            originals = service.get_originals(tokens + ["MERCHANT_9999"])
+
+        assert originals == dict(zip(tokens, ["Target", "Aldi", "Costco"]))
+
+    def test_token_stats(self, db_session):
+        """Stats should report every token type, including empty ones."""
+        service = TokenizationService(db_session)
+        service.tokenize_merchant("Whole Foods")
+        service.tokenize_merchant("Target")
+        service.tokenize_description("VENMO JOHN SMITH")
+
+        stats = service.get_token_stats()
+
+        assert stats["merchant"] == 2
+        assert stats["person"] == 1
+        assert stats["account"] == 0
+        assert stats["date_shift_days"] == 0
+
     def test_tokenize_transaction(self, db_session):
         """Should tokenize full transaction dict."""
         service = TokenizationService(db_session)
@@ -203,14 +413,37 @@ class TestBulkOperations:
         assert "clean_merchant" not in result
         assert "account_name" not in result
 
+    @pytest.mark.query_budget(15)
+    def test_tokenize_transactions_batch(self, db_session):
+        """Batch form should match the per-row form and keep input order."""
+        service = TokenizationService(db_session)
+
+        results = service.tokenize_transactions_for_ai(
+            [
+                {"merchant": "Target", "date": date(2024, 1, 15)},
+                {"merchant": "Costco", "date": "2024-01-16", "account_name": "Chase"},
+                {"merchant": "target", "date": "2024-01-17"},
+                {"merchant": "Target", "date": "2024-01-15"},
+            ],
+            include_category=False,
+        )
+
+        assert results[0]["merchant"] == results[2]["merchant"]
+        assert results[1]["merchant"] != results[0]["merchant"]
+        assert results[1]["account"].startswith("ACCOUNT_")
+        shift = timedelta(days=service._get_date_shift())
+        assert results[0]["date"] == (date(2024, 1, 15) + shift).isoformat()
+        assert results[3]["date"] == results[0]["date"]
+        assert service.tokenize_transaction_for_ai(
+            {"merchant": "Costco", "date": "2024-01-16"}, include_category=False
+        ) == {"merchant": results[1]["merchant"], "date": results[1]["date"]}
+
 
 class TestPrivacySettings:
     """Tests for privacy settings persistence."""
 
     def test_settings_created_on_first_access(self, db_session):
         """Settings should be created with defaults on first access."""
-        from app.models.privacy_settings import get_or_create_privacy_settings
-
         settings = get_or_create_privacy_settings(db_session)
 
         assert settings.obfuscation_enabled == True
@@ -219,8 +452,6 @@ class TestPrivacySettings:
 
     def test_settings_persisted(self, db_session):
         """Settings changes should persist."""
-        from app.models.privacy_settings import get_or_create_privacy_settings, PrivacySettings
-
         # Get and modify
         settings = get_or_create_privacy_settings(db_session)
         settings.ollama_obfuscation = True
@@ -230,3 +461,30 @@ class TestPrivacySettings:
         db_session.expire(settings)
         settings2 = db_session.query(PrivacySettings).filter(PrivacySettings.id == 1).first()
         assert settings2.ollama_obfuscation == True
+
+    def test_settings_reused_within_session(self, db_session):
+        """Repeat lookups in one session come from the identity map."""
+        settings = get_or_create_privacy_settings(db_session)
+
+        with assert_max_queries(db_session, 0):
+            assert get_or_create_privacy_settings(db_session) is settings
+
+    def test_flags_cached_per_session(self, db_session):
+        """Flags are cached on the session only; other sessions read the row."""
+        assert get_obfuscation_flags(db_session) == (
+            True,
+            {"ollama": False, "openrouter": True, "anthropic": True, "openai": True},
+        )
+
+        settings = get_or_create_privacy_settings(db_session)
+        settings.ollama_obfuscation = True
+        db_session.commit()
+        with assert_max_queries(db_session, 0):
+            assert get_obfuscation_flags(db_session)[1]["ollama"] is False
+
+        other = Session(bind=db_session.connection())
+        assert get_obfuscation_flags(other)[1]["ollama"] is True
+        other.close()
+
+        invalidate_privacy_cache(db_session)
+        assert get_obfuscation_flags(db_session)[1]["ollama"] is True
@@ -149,6 +149,10 @@ export const uploadFile = async (file: File) => {
   return response.data
 }
 
+// Background imports are polled for up to 10 minutes
+const IMPORT_POLL_INTERVAL_MS = 1000
+const IMPORT_POLL_MAX_ATTEMPTS = 600
+
 export const confirmImport = async (
   importId: string,
   data: ImportConfirmRequest
@@ -157,7 +161,24 @@ export const confirmImport = async (
     `/imports/${importId}/confirm`,
     data
   )
-  return response.data
+
+  // The import runs in the background; poll until it settles or we give up
+  let status = response.data
+  for (
+    let attempt = 0;
+    status.status === 'processing' || status.status === 'pending';
+    attempt++
+  ) {
+    if (attempt >= IMPORT_POLL_MAX_ATTEMPTS) {
+      throw new Error('Import is still processing; check import history for the result')
+    }
+    await new Promise((resolve) => setTimeout(resolve, IMPORT_POLL_INTERVAL_MS))
+    status = await getImportStatus(importId)
+  }
+  if (status.status === 'failed') {
+    throw new Error(status.errors[0] || 'Import failed')
+  }
+  return status
 }
 
 export const getImportStatus = async (importId: string) => {
@@ -307,7 +328,7 @@ export async function updateAlert(id: string, data: {
 
 export async function markAllAlertsRead() {
   const response = await api.post('/alerts/mark-all-read')
-  return response.data
+  return response.data as { marked_read: number; alert_ids: string[] }
 }
 
 export async function deleteAlert(id: string) {